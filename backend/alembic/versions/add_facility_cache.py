@@ -0,0 +1,40 @@
+"""create facility_cache table
+
+Revision ID: add_facility_cache
+Revises: add_google_tokens
+Create Date: 2026-10-16 00:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'add_facility_cache'
+down_revision: Union[str, Sequence[str], None] = 'add_google_tokens'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('facility_cache',
+    sa.Column('lookup_key', sa.String(), nullable=False),
+    sa.Column('place_id', sa.String(), nullable=True),
+    sa.Column('found', sa.Boolean(), nullable=False),
+    sa.Column('name', sa.String(), nullable=False),
+    sa.Column('address', sa.String(), nullable=False),
+    sa.Column('latitude', sa.Float(), nullable=True),
+    sa.Column('longitude', sa.Float(), nullable=True),
+    sa.Column('phone', sa.String(), nullable=True),
+    sa.Column('rating', sa.Float(), nullable=True),
+    sa.Column('website', sa.String(), nullable=True),
+    sa.Column('fetched_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.PrimaryKeyConstraint('lookup_key')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('facility_cache')
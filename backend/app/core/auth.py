@@ -9,17 +9,31 @@ Usage in any route:
 
 In development (BYPASS_AUTH=True): returns a fake user so you can test without OAuth.
 In production (BYPASS_AUTH=False): validates the Supabase JWT using SUPABASE_JWT_SECRET.
+
+Verified payloads are cached (keyed by a hash of the token) until the token's
+`exp`, so repeat calls with the same bearer token skip signature verification.
+RS256/ES256 keys come from the background-refreshed JWKS cache in core/jwks.py.
 """
 
+import hashlib
+import time
+
 from fastapi import Depends, HTTPException
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from typing import Optional
-import requests
-from jose import jwt, JWTError, jwk
+import httpx
+from jose import jwt, JWTError
 from app.core.config import settings
+from app.core.jwks import jwks_cache
+from app.services.cache import TTLCache
 
 security = HTTPBearer(auto_error=False)
 
+# sha256(token) → verified payload, honored until the token expires
+verified_tokens: TTLCache[dict] = TTLCache(
+    "verified_tokens", settings.TOKEN_CACHE_MAX_ENTRIES, settings.TOKEN_CACHE_MAX_TTL_SECONDS,
+)
+
 async def get_current_user(
     credentials: Optional[HTTPAuthorizationCredentials] = Depends(security)
 ) -> dict:
@@ -41,8 +55,13 @@ async def get_current_user(
     if not credentials:
         raise HTTPException(status_code=401, detail="Authorization token required")
 
+    token = credentials.credentials
+    token_hash = hashlib.sha256(token.encode()).hexdigest()
+    cached = verified_tokens.get(token_hash)
+    if cached is not None:
+        return dict(cached)
+
     try:
-        token = credentials.credentials
         unverified_header = jwt.get_unverified_header(token)
         alg = unverified_header.get("alg")
         kid = unverified_header.get("kid")
@@ -56,16 +75,9 @@ async def get_current_user(
             if not settings.SUPABASE_URL:
                 raise HTTPException(status_code=500, detail="SUPABASE_URL is required to verify RS256/ES256 tokens")
 
-            jwks_url = f"{settings.SUPABASE_URL.rstrip('/')}/auth/v1/.well-known/jwks.json"
-            resp = requests.get(jwks_url, timeout=5)
-            resp.raise_for_status()
-            jwks = resp.json().get("keys", [])
-
-            key_data = next((k for k in jwks if k.get("kid") == kid), None)
-            if not key_data:
+            key = await jwks_cache.get_key(kid)
+            if key is None:
                 raise HTTPException(status_code=401, detail="No matching JWK key found")
-
-            key = jwk.construct(key_data)
             algorithms = [alg]
         else:
             raise HTTPException(status_code=401, detail=f"Unsupported JWT algorithm: {alg}")
@@ -76,8 +88,11 @@ async def get_current_user(
             algorithms=algorithms,
             options={"verify_aud": False},
         )
+        exp = payload.get("exp")
+        if isinstance(exp, (int, float)):
+            verified_tokens.set(token_hash, dict(payload), ttl_seconds=min(exp - time.time(), settings.TOKEN_CACHE_MAX_TTL_SECONDS))
         return payload
     except JWTError as e:
         raise HTTPException(status_code=401, detail=f"Invalid or expired token: {str(e)}")
-    except requests.RequestException as e:
+    except httpx.HTTPError as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch Supabase JWKS: {str(e)}")
\ No newline at end of file
@@ -1,10 +1,16 @@
 # Application configuration
 from pydantic_settings import BaseSettings
-from typing import Optional
+from typing import Any, Dict, Optional
 
 class Settings(BaseSettings):
     # Database
     DATABASE_URL: str
+    DATABASE_ASYNC_URL: Optional[str] = None  # defaults to DATABASE_URL with the asyncpg driver
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT_SECONDS: float = 30.0
+    DB_POOL_RECYCLE_SECONDS: int = 1800
+    DB_STATEMENT_CACHE_SIZE: int = 100  # asyncpg prepared statements per connection; 0 behind pgbouncer (Supabase :6543)
 
     # API
     API_V1_STR: str = "/api/v1"
@@ -22,12 +28,29 @@ class Settings(BaseSettings):
     # Auth
     BYPASS_AUTH: bool = False  # Set to True locally for testing without OAuth
     SUPABASE_JWT_SECRET: str
+    JWKS_REFRESH_SECONDS: int = 600
+    JWKS_MIN_REFETCH_SECONDS: int = 30  # rate limit for refetches triggered by an unknown kid
+    TOKEN_CACHE_MAX_ENTRIES: int = 10000
+    TOKEN_CACHE_MAX_TTL_SECONDS: int = 300
 
     # OpenAI
     OPENAI_API_KEY: Optional[str] = None
 
     # Gemini
     GEMINI_API_KEY: Optional[str] = None
+    GEMINI_MODEL: str = "gemini-2.5-flash"
+    # Per use-site overrides ("classification", "disposal", "schedule"), e.g. {"schedule": {"temperature": 0.2}}
+    GEMINI_SITE_PARAMS: Dict[str, Dict[str, Any]] = {}
+    LLM_WARMUP_ON_STARTUP: bool = True
+    # Shared call scheduler (app/services/llm_scheduler.py)
+    GEMINI_MAX_CONCURRENCY: int = 16
+    GEMINI_MIN_CONCURRENCY: int = 1
+    GEMINI_INITIAL_CONCURRENCY: int = 8
+    GEMINI_LATENCY_TARGET_SECONDS: float = 20.0
+    GEMINI_MAX_RETRIES: int = 3
+    GEMINI_RETRY_BASE_SECONDS: float = 0.5
+    GEMINI_RETRY_MAX_SECONDS: float = 8.0
+    GEMINI_QUEUE_TIMEOUT_SECONDS: float = 30.0
 
     # Tavily - Web Search
     TAVILY_API_KEY: Optional[str] = None
@@ -42,6 +65,83 @@ class Settings(BaseSettings):
     GOOGLE_OAUTH_CLIENT_ID: Optional[str] = None
     GOOGLE_OAUTH_CLIENT_SECRET: Optional[str] = None
     GOOGLE_OAUTH_REDIRECT_URI: Optional[str] = None
+    GOOGLE_CREDENTIAL_CACHE_SIZE: int = 1000
+    GOOGLE_CREDENTIAL_CACHE_TTL_SECONDS: int = 6 * 3600
+    GOOGLE_TOKEN_REFRESH_MARGIN_SECONDS: int = 5 * 60  # refresh in the background once this close to expiry
+
+    # Disposal agent
+    DISPOSAL_PARALLEL: bool = False  # one sub-agent per item instead of one conversation for all items
+    DISPOSAL_MAX_CONCURRENCY: int = 4
+    DISPOSAL_MAX_TOOL_ITERATIONS: int = 4     # search rounds before Gemini must answer
+    DISPOSAL_DEADLINE_SECONDS: float = 30.0   # wall-clock budget for the disposal phase
+    DISPOSAL_FINAL_ANSWER_SECONDS: float = 8.0  # grace for the forced answer once a budget is spent
+    DISPOSAL_TOKEN_BUDGET: int = 100000       # total Gemini tokens across loop iterations
+    DISPOSAL_COMPACT_TOOL_RESULTS: bool = True  # dedupe/trim search results between iterations
+    DISPOSAL_SNIPPET_CHARS: int = 600         # per search result, newest iteration; older ones keep a quarter
+
+    # Image uploads (multipart /classify/upload)
+    IMAGE_UPLOAD_MAX_BYTES: int = 15 * 1024 * 1024
+
+    # Image preprocessing before Gemini (downscale + recompress)
+    IMAGE_PREPROCESS_ENABLED: bool = True
+    IMAGE_PREPROCESS_WORKERS: int = 2
+    IMAGE_MAX_EDGE: int = 1024
+    IMAGE_JPEG_QUALITY: int = 85
+    IMAGE_MIN_JPEG_QUALITY: int = 55
+    IMAGE_MAX_BYTES: int = 400_000
+
+    # Per-user rate limiting + fair queuing (app/core/rate_limit.py)
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_BURST: int = 50  # >= BATCH_MAX_SIZE, or full-size batches can never pass
+    RATE_LIMIT_REFILL_PER_MINUTE: float = 20.0
+    RATE_LIMIT_BACKEND: str = "memory"  # "memory" or "redis"
+    RATE_LIMIT_REDIS_URL: Optional[str] = None
+    RATE_LIMIT_MAX_TRACKED_USERS: int = 100000
+    CLASSIFY_MAX_CONCURRENT: int = 32
+    CLASSIFY_QUEUE_TIMEOUT_SECONDS: float = 60.0
+
+    # Schedule suggestions — slots come from the local engine; Gemini can optionally re-rank them
+    SCHEDULE_LLM_RERANK: bool = False
+
+    # Google Calendar (cached per-user service objects)
+    CALENDAR_SESSION_CACHE_SIZE: int = 1000
+    CALENDAR_SESSION_TTL_SECONDS: int = 60 * 60
+    CALENDAR_BUSY_CACHE_MAX_USERS: int = 10000
+    CALENDAR_BUSY_CACHE_TTL_SECONDS: int = 5 * 60
+
+    # Batch classification
+    BATCH_MAX_SIZE: int = 50
+    BATCH_MAX_CONCURRENCY: int = 8
+
+    # Caching
+    CACHE_ENABLED: bool = True
+    CACHE_DB_PATH: Optional[str] = ".cache/agent_cache.sqlite3"  # set empty to disable the on-disk tier
+    CLASSIFICATION_CACHE_MAX_ENTRIES: int = 5000
+    CLASSIFICATION_CACHE_TTL_SECONDS: int = 7 * 24 * 3600
+    IMAGE_CACHE_MAX_ENTRIES: int = 20000
+    IMAGE_CACHE_TTL_SECONDS: int = 24 * 3600
+    IMAGE_CACHE_MAX_HAMMING: int = 4  # 0 = exact matches only
+    DISPOSAL_CACHE_MAX_ENTRIES: int = 5000
+    DISPOSAL_CACHE_TTL_SECONDS: int = 24 * 3600
+    SEARCH_CACHE_MAX_ENTRIES: int = 10000
+    SEARCH_CACHE_TTL_SECONDS: int = 24 * 3600
+    FACILITY_CACHE_MAX_ENTRIES: int = 10000
+    FACILITY_CACHE_MAX_AGE_DAYS: int = 30
+    FACILITY_NEGATIVE_CACHE_HOURS: int = 24
+
+    # IP geolocation
+    IP_GEO_DB_PATH: Optional[str] = None  # binary index built with `python -m app.services.ip_geo_index`
+    IP_GEO_CACHE_SIZE: int = 10000
+    IP_GEO_CACHE_TTL_SECONDS: int = 6 * 3600
+
+    # Outbound HTTP (shared pooled clients, one per upstream)
+    HTTP_MAX_CONNECTIONS: int = 50
+    HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    HTTP_KEEPALIVE_EXPIRY_SECONDS: float = 60.0
+    HTTP_TIMEOUT_SECONDS: float = 10.0
+    HTTP_CONNECT_TIMEOUT_SECONDS: float = 5.0
+    HTTP_POOL_TIMEOUT_SECONDS: float = 5.0
+    HTTP2_ENABLED: bool = False
 
     # Environment
     ENVIRONMENT: str = "development"
@@ -0,0 +1,114 @@
+"""
+Supabase JWKS cache for RS256/ES256 token verification.
+
+Keys are indexed by `kid` and refreshed in the background with async I/O, so
+authenticated requests never wait on the JWKS endpoint. A token signed with an
+unknown `kid` (key rotation) triggers an immediate refetch, rate-limited so a
+flood of bad tokens can't hammer Supabase.
+"""
+import asyncio
+import logging
+import time
+from typing import Any, Dict, Optional
+
+from jose import jwk
+
+from app.core.config import settings
+from app.services.http_clients import get_http_client
+
+logger = logging.getLogger(__name__)
+
+
+class JWKSCache:
+    def __init__(self):
+        self._keys: Dict[str, Any] = {}
+        self._fetched_at = 0.0
+        self._last_attempt = 0.0
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self.refreshes = 0
+        self.refresh_failures = 0
+
+    @property
+    def url(self) -> str:
+        return f"{settings.SUPABASE_URL.rstrip('/')}/auth/v1/.well-known/jwks.json"
+
+    async def refresh(self) -> None:
+        """Fetch the key set and swap it in. Raises httpx.HTTPError on failure; old keys are kept."""
+        self._last_attempt = time.monotonic()
+        resp = await get_http_client("supabase").get(self.url, timeout=5.0)
+        resp.raise_for_status()
+        keys = {}
+        for key_data in resp.json().get("keys", []):
+            kid = key_data.get("kid")
+            if kid:
+                keys[kid] = jwk.construct(key_data)
+        self._keys = keys
+        self._fetched_at = time.monotonic()
+        self.refreshes += 1
+        logger.info("JWKS refreshed — %d key(s)", len(keys))
+
+    async def get_key(self, kid: Optional[str]) -> Optional[Any]:
+        """Return the verification key for `kid`, refetching once if it's unknown (rate-limited)."""
+        key = self._keys.get(kid)
+        stale = time.monotonic() - self._fetched_at > settings.JWKS_REFRESH_SECONDS * 2
+        if key is not None and not stale:
+            return key
+
+        async with self._lock:
+            key = self._keys.get(kid)
+            if key is not None and time.monotonic() - self._fetched_at <= settings.JWKS_REFRESH_SECONDS * 2:
+                return key  # another request refreshed while we waited
+            if time.monotonic() - self._last_attempt >= settings.JWKS_MIN_REFETCH_SECONDS:
+                logger.info("JWKS refetch — kid=%r known=%s stale=%s", kid, key is not None, stale)
+                try:
+                    await self.refresh()
+                except Exception as e:
+                    self.refresh_failures += 1
+                    if key is None:
+                        raise
+                    logger.warning("JWKS refetch failed — using cached key for kid=%r: %s", kid, e)
+        return self._keys.get(kid)
+
+    async def _refresh_loop(self) -> None:
+        while True:
+            await asyncio.sleep(settings.JWKS_REFRESH_SECONDS)
+            try:
+                async with self._lock:
+                    await self.refresh()
+            except Exception as e:
+                self.refresh_failures += 1
+                logger.warning("Background JWKS refresh failed — keeping %d cached key(s): %s", len(self._keys), e)
+
+    async def start(self) -> None:
+        """Warm the cache and start background refreshes (called from the app lifespan)."""
+        if self._task is not None:
+            return
+        try:
+            async with self._lock:
+                await self.refresh()
+        except Exception as e:
+            self.refresh_failures += 1
+            self._last_attempt = 0.0  # let the first RS256/ES256 request retry immediately
+            logger.warning("Initial JWKS fetch failed — will retry on first RS256/ES256 request: %s", e)
+        self._task = asyncio.create_task(self._refresh_loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "keys": len(self._keys),
+            "age_seconds": round(time.monotonic() - self._fetched_at, 1) if self._fetched_at else None,
+            "refreshes": self.refreshes,
+            "refresh_failures": self.refresh_failures,
+        }
+
+
+jwks_cache = JWKSCache()
@@ -0,0 +1,234 @@
+"""
+Per-user rate limiting and fair queuing for classification.
+
+Two layers, both keyed by the JWT `sub`:
+
+1. Token bucket (check_rate_limit): each user gets RATE_LIMIT_BURST tokens,
+   refilled at RATE_LIMIT_REFILL_PER_MINUTE. A request costs one token (a batch
+   costs one per entry); an empty bucket answers 429 with Retry-After.
+   Buckets live in a pluggable backend:
+   - "memory" — per-process, the default
+   - "redis"  — shared by every worker (RATE_LIMIT_REDIS_URL); the bucket is
+     updated atomically in a Lua script. Needs the optional `redis` package.
+
+2. Fair queue (fair_queue.slot): at most CLASSIFY_MAX_CONCURRENT pipeline runs
+   at once. When that's saturated, freed slots go to waiting users round-robin,
+   so one client with 50 queued requests can't starve everyone behind it.
+"""
+import asyncio
+import logging
+from abc import ABC, abstractmethod
+import math
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Deque, Dict, Tuple
+
+from fastapi import HTTPException
+
+from app.core.config import settings
+from app.services.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+
+# ── Token bucket backends ────────────────────────────────────────────────────
+
+class RateLimitBackend(ABC):
+    """Takes tokens from a named bucket. Returns 0 if allowed, else seconds until enough tokens refill."""
+
+    name = "base"
+
+    @abstractmethod
+    async def take(self, key: str, cost: float, capacity: float, refill_per_second: float) -> float:
+        ...
+
+
+class MemoryRateLimitBackend(RateLimitBackend):
+    name = "memory"
+
+    def __init__(self, max_users: int):
+        # Idle buckets expire once they would have refilled completely anyway
+        self._buckets: TTLCache[Tuple[float, float]] = TTLCache(
+            "rate_limit_buckets", max_users, ttl_seconds=3600,
+        )
+
+    async def take(self, key: str, cost: float, capacity: float, refill_per_second: float) -> float:
+        now = time.monotonic()
+        tokens, updated = self._buckets.peek(key, touch=True) or (capacity, now)
+        tokens = min(capacity, tokens + (now - updated) * refill_per_second)
+        ttl = capacity / refill_per_second if refill_per_second > 0 else 3600
+        if tokens >= cost:
+            self._buckets.set(key, (tokens - cost, now), ttl_seconds=ttl)
+            return 0.0
+        self._buckets.set(key, (tokens, now), ttl_seconds=ttl)
+        if refill_per_second <= 0:
+            return float("inf")
+        return (cost - tokens) / refill_per_second
+
+
+# KEYS[1] bucket key; ARGV: cost, capacity, refill/s, now (s). Returns seconds to wait (string), "0" if allowed.
+_REDIS_TAKE = """
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local cost, capacity, rate, now = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3]), tonumber(ARGV[4])
+local tokens = tonumber(state[1]) or capacity
+local updated = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated) * rate)
+local wait = 0
+if tokens >= cost then
+  tokens = tokens - cost
+elseif rate > 0 then
+  wait = (cost - tokens) / rate
+else
+  wait = -1
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated', now)
+if rate > 0 then
+  redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+end
+return tostring(wait)
+"""
+
+
+class RedisRateLimitBackend(RateLimitBackend):
+    name = "redis"
+
+    def __init__(self, url: str):
+        try:
+            import redis.asyncio as redis  # optional dependency
+        except ImportError as e:
+            raise ImportError("RedisRateLimitBackend needs the optional 'redis' package — pip install redis") from e
+
+        self._redis = redis.from_url(url)
+        self._script = self._redis.register_script(_REDIS_TAKE)
+
+    async def take(self, key: str, cost: float, capacity: float, refill_per_second: float) -> float:
+        wait = float(await self._script(
+            keys=[f"ratelimit:{key}"], args=[cost, capacity, refill_per_second, time.time()],
+        ))
+        return float("inf") if wait < 0 else wait
+
+
+def _make_backend() -> RateLimitBackend:
+    if settings.RATE_LIMIT_BACKEND == "redis":
+        if not settings.RATE_LIMIT_REDIS_URL:
+            logger.warning("RATE_LIMIT_BACKEND=redis but RATE_LIMIT_REDIS_URL is not set — using in-memory buckets")
+        else:
+            try:
+                return RedisRateLimitBackend(settings.RATE_LIMIT_REDIS_URL)
+            except ImportError as e:
+                logger.warning("RATE_LIMIT_BACKEND=redis: %s — using in-memory buckets", e)
+    return MemoryRateLimitBackend(max_users=settings.RATE_LIMIT_MAX_TRACKED_USERS)
+
+
+rate_limit_backend = _make_backend()
+_limit_stats = {"allowed": 0, "limited": 0, "backend_errors": 0}
+
+
+def user_key(user: dict) -> str:
+    return str(user.get("sub") or "anonymous")
+
+
+async def check_rate_limit(user: dict, cost: int = 1) -> None:
+    """Take `cost` tokens from the user's bucket, or raise 429 with Retry-After."""
+    if not settings.RATE_LIMIT_ENABLED:
+        return
+    key = user_key(user)
+    capacity = float(settings.RATE_LIMIT_BURST)
+    if cost > capacity:
+        raise HTTPException(status_code=413, detail=f"Request costs {cost} tokens but the burst limit is {int(capacity)}")
+    try:
+        wait = await rate_limit_backend.take(key, float(cost), capacity, settings.RATE_LIMIT_REFILL_PER_MINUTE / 60.0)
+    except Exception as e:
+        # Fail open — a broken shared backend shouldn't take classification down with it
+        _limit_stats["backend_errors"] += 1
+        logger.warning("Rate limit backend %s failed for user=%s — allowing request: %s", rate_limit_backend.name, key, e)
+        return
+    if wait <= 0:
+        _limit_stats["allowed"] += 1
+        return
+    _limit_stats["limited"] += 1
+    retry_after = 3600 if math.isinf(wait) else max(1, math.ceil(wait))
+    logger.info("Rate limit hit — user=%s cost=%d retry_after=%ds", key, cost, retry_after)
+    raise HTTPException(
+        status_code=429,
+        detail="Too many classification requests — slow down",
+        headers={"Retry-After": str(retry_after)},
+    )
+
+
+# ── Fair queue ───────────────────────────────────────────────────────────────
+
+class FairQueue:
+    """Concurrency limit whose free slots are handed to waiting users round-robin."""
+
+    def __init__(self, max_concurrent: int, timeout_seconds: float):
+        self.max_concurrent = max(1, max_concurrent)
+        self.timeout_seconds = timeout_seconds
+        self.active = 0
+        self._waiting: "OrderedDict[str, Deque[asyncio.Future[None]]]" = OrderedDict()
+        self.queued_total = 0
+        self.timeouts = 0
+
+    def _grant_next(self) -> None:
+        while self.active < self.max_concurrent and self._waiting:
+            user, waiters = self._waiting.popitem(last=False)
+            while waiters and waiters[0].done():
+                waiters.popleft()  # timed out / cancelled
+            if not waiters:
+                continue
+            waiters.popleft().set_result(None)
+            self.active += 1
+            if waiters:
+                self._waiting[user] = waiters  # back of the line, behind every other waiting user
+
+    def _release(self) -> None:
+        self.active -= 1
+        self._grant_next()
+
+    @asynccontextmanager
+    async def slot(self, user: str) -> AsyncIterator[None]:
+        if self.active < self.max_concurrent and not self._waiting:
+            self.active += 1
+        else:
+            future: "asyncio.Future[None]" = asyncio.get_running_loop().create_future()
+            self._waiting.setdefault(user, deque()).append(future)
+            self.queued_total += 1
+            self._grant_next()  # clears out abandoned waiters; grants at once if a slot is actually free
+            try:
+                await asyncio.wait_for(asyncio.shield(future), timeout=self.timeout_seconds)
+            except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+                if future.done() and not future.cancelled():
+                    self._release()  # granted just as we gave up
+                future.cancel()
+                if isinstance(e, asyncio.TimeoutError):
+                    self.timeouts += 1
+                    raise HTTPException(
+                        status_code=503, detail="Classification is busy — try again shortly",
+                        headers={"Retry-After": "5"},
+                    )
+                raise
+        try:
+            yield
+        finally:
+            self._release()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "active": self.active,
+            "max_concurrent": self.max_concurrent,
+            "waiting_users": len(self._waiting),
+            "waiting_requests": sum(sum(1 for f in q if not f.done()) for q in self._waiting.values()),
+            "queued_total": self.queued_total,
+            "timeouts": self.timeouts,
+        }
+
+
+fair_queue = FairQueue(
+    max_concurrent=settings.CLASSIFY_MAX_CONCURRENT,
+    timeout_seconds=settings.CLASSIFY_QUEUE_TIMEOUT_SECONDS,
+)
+
+
+def stats() -> Dict[str, Any]:
+    return {"backend": rate_limit_backend.name, **_limit_stats, "fair_queue": fair_queue.stats()}
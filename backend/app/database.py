@@ -1,14 +1,99 @@
-# Database configuration and connection will go here
-from sqlalchemy import create_engine
+# Database configuration and connection
+#
+# Two engines share one set of pool settings (DB_POOL_* in Settings):
+# - engine / SessionLocal      — sync (psycopg2), for thread-pool code and alembic
+# - get_async_db()              — async (asyncpg), for request handlers, so a
+#   query never blocks the event loop or holds a threadpool worker
+# Both pools time every checkout; pool_stats() feeds /api/v1/metrics.
+import logging
+import time
+from typing import Any, AsyncIterator, Dict, Optional, Type
+
+from sqlalchemy import create_engine, exc
+from sqlalchemy.engine import URL, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, Pool, QueuePool
+
 from app.core.config import settings
 
+logger = logging.getLogger(__name__)
+
+SLOW_CHECKOUT_SECONDS = 0.5
+
+
+class PoolStats:
+    """How long callers waited for a pooled connection (includes opening a new one)."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    def record(self, pool: Pool, seconds: float, timed_out: bool) -> None:
+        self.checkouts += 1
+        self.wait_seconds += seconds
+        self.max_wait_seconds = max(self.max_wait_seconds, seconds)
+        if timed_out:
+            self.timeouts += 1
+        if seconds >= SLOW_CHECKOUT_SECONDS:
+            logger.warning(
+                "DB pool %s — waited %.0f ms for a connection (%s)",
+                self.name, seconds * 1000, pool.status(),
+            )
+
+    def snapshot(self, pool: Pool) -> Dict[str, Any]:
+        return {
+            "size": pool.size(),
+            "in_use": pool.checkedout(),
+            "idle": pool.checkedin(),
+            "overflow": max(0, pool.overflow()),
+            "checkouts": self.checkouts,
+            "timeouts": self.timeouts,
+            "avg_wait_ms": round(self.wait_seconds / self.checkouts * 1000, 2) if self.checkouts else 0.0,
+            "max_wait_ms": round(self.max_wait_seconds * 1000, 2),
+        }
+
+
+def _timed_pool(base: Type[QueuePool], stats: PoolStats) -> Type[QueuePool]:
+    """Subclass of `base` that times checkouts. dispose() recreates the pool with the same class, so stats carry over."""
+
+    class TimedPool(base):  # type: ignore[misc, valid-type]
+        def _do_get(self):
+            start = time.perf_counter()
+            timed_out = False
+            try:
+                return super()._do_get()
+            except exc.TimeoutError:
+                timed_out = True
+                raise
+            finally:
+                stats.record(self, time.perf_counter() - start, timed_out)
+
+    TimedPool.__name__ = f"Timed{base.__name__}"
+    return TimedPool
+
+
+def _pool_args() -> Dict[str, Any]:
+    return {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT_SECONDS,
+        "pool_recycle": settings.DB_POOL_RECYCLE_SECONDS,
+        "pool_pre_ping": True,
+    }
+
+
 # Create database engine
+sync_pool_stats = PoolStats("sync")
 engine = create_engine(
     settings.DATABASE_URL,
     connect_args={"sslmode": "require"},
-    pool_pre_ping=True
+    poolclass=_timed_pool(QueuePool, sync_pool_stats),
+    **_pool_args(),
 )
 
 # Create SessionLocal class
@@ -23,4 +108,70 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+# ── Async engine ──────────────────────────────────────────────────────────────
+
+async_pool_stats = PoolStats("async")
+_async_engine: Optional[AsyncEngine] = None
+_async_sessions: Optional[async_sessionmaker[AsyncSession]] = None
+
+
+def async_database_url() -> URL:
+    if settings.DATABASE_ASYNC_URL:
+        return make_url(settings.DATABASE_ASYNC_URL)
+    url = make_url(settings.DATABASE_URL)
+    if url.get_backend_name() == "postgresql":
+        # asyncpg takes SSL through connect_args and rejects libpq's sslmode
+        url = url.set(drivername="postgresql+asyncpg").difference_update_query(["sslmode"])
+    return url
+
+
+def get_async_engine() -> AsyncEngine:
+    """Built on first use, so importing this module (alembic, scripts) doesn't need asyncpg."""
+    global _async_engine, _async_sessions
+    if _async_engine is None:
+        url = async_database_url()
+        connect_args: Dict[str, Any] = {}
+        if url.get_driver_name() == "asyncpg":
+            # Both statement caches must be off (0) behind pgbouncer in transaction mode
+            url = url.update_query_dict({"prepared_statement_cache_size": str(settings.DB_STATEMENT_CACHE_SIZE)})
+            connect_args = {"ssl": "require", "statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE}
+        _async_engine = create_async_engine(
+            url,
+            connect_args=connect_args,
+            poolclass=_timed_pool(AsyncAdaptedQueuePool, async_pool_stats),
+            **_pool_args(),
+        )
+        _async_sessions = async_sessionmaker(_async_engine, expire_on_commit=False, autoflush=False)
+        logger.info(
+            "Async DB engine created — driver=%s pool_size=%d max_overflow=%d",
+            url.drivername, settings.DB_POOL_SIZE, settings.DB_MAX_OVERFLOW,
+        )
+    return _async_engine
+
+
+def new_async_session() -> AsyncSession:
+    """A session not tied to a request — for background work. Use as `async with new_async_session() as db`."""
+    get_async_engine()
+    return _async_sessions()
+
+
+async def get_async_db() -> AsyncIterator[AsyncSession]:
+    async with new_async_session() as db:
+        yield db
+
+
+async def dispose_async_engine() -> None:
+    global _async_engine, _async_sessions
+    if _async_engine is not None:
+        await _async_engine.dispose()
+    _async_engine = _async_sessions = None
+
+
+def pool_stats() -> Dict[str, Any]:
+    stats = {"sync": sync_pool_stats.snapshot(engine.pool)}
+    if _async_engine is not None:
+        stats["async"] = async_pool_stats.snapshot(_async_engine.sync_engine.pool)
+    return stats
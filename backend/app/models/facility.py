@@ -0,0 +1,19 @@
+# Cached Google Places lookups for disposal facilities
+from sqlalchemy import Boolean, Column, DateTime, Float, String
+from sqlalchemy.sql import func
+from app.database import Base
+
+class FacilityCache(Base):
+    __tablename__ = "facility_cache"
+
+    lookup_key = Column(String, primary_key=True)  # normalized "name|address" as Gemini returned it
+    place_id = Column(String, nullable=True)
+    found = Column(Boolean, nullable=False, default=True)  # False = Places returned nothing (negative cache)
+    name = Column(String, nullable=False)
+    address = Column(String, nullable=False)
+    latitude = Column(Float, nullable=True)
+    longitude = Column(Float, nullable=True)
+    phone = Column(String, nullable=True)
+    rating = Column(Float, nullable=True)
+    website = Column(String, nullable=True)
+    fetched_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
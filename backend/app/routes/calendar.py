@@ -1,21 +1,21 @@
-import json
 import logging
 from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 
 from fastapi import APIRouter, Depends, HTTPException
-from googleapiclient.discovery import build
-from langchain_google_genai import ChatGoogleGenerativeAI
 from pydantic import BaseModel
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.auth import get_current_user
 from app.core.config import settings
-from app.database import get_db
-from app.services.google_auth import (
-    build_google_credentials,
-    get_user_with_google_tokens,
-    refresh_credentials_if_needed,
-)
+from app.database import get_async_db
+from app.services.busy_cache import busy_cache
+from app.services.calendar_client import calendar_client
+from app.services.google_auth import google_credentials
+from app.services.llm_clients import get_llm
+from app.services.llm_scheduler import Priority, gemini_scheduler
+from app.services.slot_engine import Slot, suggest_slots
+from app.services.structured_output import extract_json
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/api/v1", tags=["calendar"])
@@ -49,105 +49,119 @@ class SuggestSlotsResponse(BaseModel):
     suggestions: list[SlotSuggestion]
 
 
+# ── Slot engine helpers ────────────────────────────────────────────────────────
+
+def to_suggestion(slot: Slot, label: str = "") -> SlotSuggestion:
+    hour12 = slot.start.hour % 12 or 12
+    return SlotSuggestion(
+        date=slot.start.strftime("%Y-%m-%d"),
+        time=slot.start.strftime("%H:%M"),
+        day_display=f"{slot.start:%a}, {slot.start:%b} {slot.start.day}",
+        time_display=f"{hour12}:{slot.start:%M} {'AM' if slot.start.hour < 12 else 'PM'}",
+        reason=slot.reason,
+        label=label,
+    )
+
+
+RERANK_PROMPT = """You are a scheduling assistant helping someone drop off a waste item at a facility.
+
+Facility: {facility_name} — {facility_address}
+Waste item: {waste_item}
+User's timezone: {timezone}
+
+These drop-off slots are all free in the user's calendar:
+{candidates}
+
+Rank them from best to worst for this drop-off (consider facility type, the item, and time of day).
+Respond with ONLY a JSON object listing the slot numbers, best first, e.g. {{"order": [2, 0, 1, 4, 3]}}"""
+
+
+async def rerank_with_llm(slots: list[Slot], request: SuggestSlotsRequest) -> list[Slot]:
+    """Optional Gemini re-ranking of engine-picked slots. Any failure keeps the engine's order."""
+    candidates = "\n".join(
+        f"{i}. {s.start:%a %Y-%m-%d %H:%M} — {s.reason}" for i, s in enumerate(slots)
+    )
+    prompt = RERANK_PROMPT.format(
+        facility_name=request.facility_name,
+        facility_address=request.facility_address,
+        waste_item=request.waste_item,
+        timezone=request.timezone,
+        candidates=candidates,
+    )
+    try:
+        llm = get_llm("schedule")
+        response = await gemini_scheduler.call(
+            lambda: llm.ainvoke(prompt), name="schedule_rerank", priority=Priority.BACKGROUND,
+        )
+        raw = response.content if isinstance(response.content, str) else str(response.content)
+        parsed = extract_json(raw)
+        order = parsed.get("order", []) if isinstance(parsed, dict) else []
+        ranked = [slots[i] for i in dict.fromkeys(order) if isinstance(i, int) and 0 <= i < len(slots)]
+        ranked += [s for s in slots if s not in ranked]
+        return ranked
+    except Exception as e:
+        logger.warning("Suggest slots — LLM re-rank failed, keeping engine order: %s", e)
+        return slots
+
+
 # ── Routes ─────────────────────────────────────────────────────────────────────
 
 @router.post("/schedule/suggest", response_model=SuggestSlotsResponse)
 async def suggest_schedule_slots(
     request: SuggestSlotsRequest,
     user: dict = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
-    Agentic scheduling: fetch the user's Google Calendar for the next 7 days,
-    pass existing events to Gemini, and return 5 conflict-aware time suggestions.
-    Falls back to generating suggestions without calendar data if Google Calendar
-    is not connected or the user record is not found.
+    Scheduling: get the user's busy intervals for the next 7 days (cached per user,
+    see busy_cache) and pick
+    5 conflict-free drop-off slots with the local slot engine (buffered interval
+    merge + rule-based scoring), in milliseconds. With SCHEDULE_LLM_RERANK set,
+    Gemini re-orders the engine's picks; it never invents slots.
+    Falls back to suggestions without calendar data if Google Calendar is not
+    connected or the user record is not found.
     """
+    try:
+        tz = ZoneInfo(request.timezone)
+    except (ZoneInfoNotFoundError, ValueError):
+        raise HTTPException(status_code=400, detail=f"Unknown timezone {request.timezone!r}")
+
     try:
         now = datetime.now(timezone.utc)
         week_later = now + timedelta(days=7)
-        existing_events: list[dict] = []
+        busy: list = []
+
+        async def load_creds():
+            return await google_credentials.get(user, db)
 
-        # Attempt to read Google Calendar — silently degrade if unavailable
+        # Busy intervals come from the per-user cache; Google is only called on a miss.
+        # Silently degrade if Google Calendar is unavailable.
         try:
-            db_user = get_user_with_google_tokens(user, db)
-            creds = refresh_credentials_if_needed(build_google_credentials(db_user), db_user, db)
-            calendar_service = build("calendar", "v3", credentials=creds)
-            events_result = calendar_service.events().list(
-                calendarId="primary",
-                timeMin=now.isoformat(),
-                timeMax=week_later.isoformat(),
-                singleEvents=True,
-                orderBy="startTime",
-            ).execute()
-            existing_events = [
-                {
-                    "title": e.get("summary", "Busy"),
-                    "start": e.get("start", {}).get("dateTime", e.get("start", {}).get("date", "")),
-                    "end":   e.get("end",   {}).get("dateTime", e.get("end",   {}).get("date", "")),
-                }
-                for e in events_result.get("items", [])
-            ]
+            busy = await busy_cache.get_busy(user["sub"], now, week_later, load_creds)
         except HTTPException:
             logger.info(
                 "Suggest slots — Google Calendar unavailable for user=%s, proceeding without events",
                 user.get("sub"),
             )
 
+        slots = suggest_slots(busy, now, tz)
         logger.info(
-            "Suggest slots — user=%s facility=%r item=%r existing_events=%d",
-            user.get("sub"), request.facility_name, request.waste_item, len(existing_events),
+            "Suggest slots — user=%s facility=%r item=%r busy_intervals=%d suggestions=%d",
+            user.get("sub"), request.facility_name, request.waste_item, len(busy), len(slots),
         )
+        if not slots:
+            return SuggestSlotsResponse(suggestions=[])
 
-        # Ask Gemini for 5 smart suggestions
-        llm = ChatGoogleGenerativeAI(
-            model="gemini-2.5-flash",
-            google_api_key=settings.GEMINI_API_KEY,
-        )
+        if settings.SCHEDULE_LLM_RERANK:
+            ranked = await rerank_with_llm(slots, request)
+            return SuggestSlotsResponse(suggestions=[
+                to_suggestion(slot, "Recommended" if i == 0 else "") for i, slot in enumerate(ranked)
+            ])
 
-        prompt = f"""You are a scheduling assistant helping someone drop off a waste item at a facility.
-
-Today (UTC): {now.strftime("%Y-%m-%d %H:%M")}
-User's timezone: {request.timezone}
-Facility: {request.facility_name} — {request.facility_address}
-Waste item: {request.waste_item}
-
-User's existing calendar events for the next 7 days:
-{json.dumps(existing_events, indent=2) if existing_events else "No events scheduled."}
-
-Task: Suggest exactly 5 drop-off time slots across the next 7 days. Rules:
-- Avoid times that overlap with existing events (add 30-min buffer)
-- Prefer weekday mornings 9 AM–12 PM and early afternoons 1 PM–4 PM
-- Include at least one weekend slot
-- Spread suggestions across different days — no two on the same day
-- Mark the single best option with label "Recommended", leave others as ""
-- Keep each "reason" to 6 words or fewer
-
-Respond with ONLY valid JSON — no markdown, no explanation:
-{{
-  "suggestions": [
-    {{
-      "date": "YYYY-MM-DD",
-      "time": "HH:MM",
-      "day_display": "Mon, Apr 7",
-      "time_display": "10:00 AM",
-      "reason": "Free morning, no conflicts",
-      "label": "Recommended"
-    }}
-  ]
-}}"""
-
-        response = await llm.ainvoke(prompt)
-        raw = response.content.strip()
-
-        # Strip markdown fences if Gemini wraps the JSON anyway
-        if raw.startswith("```"):
-            parts = raw.split("```")
-            raw = parts[1].lstrip("json").strip() if len(parts) > 1 else raw
-
-        data = json.loads(raw)
-        suggestions = [SlotSuggestion(**s) for s in data["suggestions"][:5]]
-        return SuggestSlotsResponse(suggestions=suggestions)
+        best = max(slots, key=lambda s: s.score)
+        return SuggestSlotsResponse(suggestions=[
+            to_suggestion(slot, "Recommended" if slot is best else "") for slot in slots
+        ])
 
     except HTTPException:
         raise
@@ -160,12 +174,11 @@ Respond with ONLY valid JSON — no markdown, no explanation:
 async def schedule_disposal(
     request: ScheduleRequest,
     user: dict = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """Create a 1-hour Google Calendar event for a facility drop-off."""
     try:
-        db_user = get_user_with_google_tokens(user, db)
-        creds = refresh_credentials_if_needed(build_google_credentials(db_user), db_user, db)
+        creds = await google_credentials.get(user, db)
 
         try:
             start_dt = datetime.fromisoformat(f"{request.date}T{request.time}")
@@ -182,9 +195,13 @@ async def schedule_disposal(
             "end":   {"dateTime": end_dt.isoformat(),   "timeZone": request.timezone},
         }
 
-        calendar_service = build("calendar", "v3", credentials=creds)
-        created = calendar_service.events().insert(calendarId="primary", body=event).execute()
+        created = await calendar_client.insert_event(user["sub"], creds, event)
         logger.info("Calendar event created: %s", created.get("id"))
+        try:
+            tz = ZoneInfo(request.timezone)
+            busy_cache.add_busy(user["sub"], start_dt.replace(tzinfo=tz), end_dt.replace(tzinfo=tz))
+        except (ZoneInfoNotFoundError, ValueError):
+            busy_cache.invalidate(user["sub"])
         return {"status": "scheduled", "event": created}
 
     except HTTPException:
@@ -1,20 +1,35 @@
 """
 Waste classification API routes.
 
-POST /api/v1/classify  — accepts a base64 image or text, invokes agentic loop, returns classification + disposal instructions
+POST /api/v1/classify         — accepts a base64 image or text, invokes agentic loop, returns classification + disposal instructions
+POST /api/v1/classify/stream  — same pipeline, streamed as Server-Sent Events while it runs
+POST /api/v1/classify/upload  — same as /classify, but the photo is sent as a multipart/form-data file
+POST /api/v1/classify/batch   — many classification requests in one call, run concurrently
 """
 
+import asyncio
+import hashlib
+import json
 import logging
 import time
+from typing import Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi import APIRouter, Depends, File, Form, HTTPException, Request, UploadFile
+from fastapi.responses import StreamingResponse
 
 from app.core.auth import get_current_user
+from app.core.rate_limit import check_rate_limit, fair_queue, user_key
+from app.core.config import settings
 from app.schemas.classification import (
+    BatchClassificationRequest,
+    BatchClassificationResponse,
+    BatchClassificationResult,
     ClassificationRequest,
     ClassificationResponse,
 )
 from app.services.agent import agent
+from app.services.cache import SingleFlight, location_key, normalize_text
+from app.services.llm_scheduler import ModelOverloadedError, Priority, llm_priority
 from app.services.location_service import get_location_from_ip
 
 logger = logging.getLogger(__name__)
@@ -23,6 +38,83 @@ logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/api/v1", tags=["classification"])
 
 
+async def resolve_location(location: Optional[str], raw_request: Request) -> Optional[str]:
+    """Use the client-provided location, or fall back to IP geolocation."""
+    if location:
+        logger.info("Using client-provided location: %r", location)
+        return location
+
+    forwarded_for = raw_request.headers.get("X-Forwarded-For", "")
+    client_ip = forwarded_for.split(",")[0].strip() or raw_request.client.host
+    logger.info(
+        "No location in request — resolving from IP. X-Forwarded-For=%r client.host=%r → using IP=%r",
+        forwarded_for, raw_request.client.host, client_ip,
+    )
+    location = await get_location_from_ip(client_ip)
+    logger.info("IP-resolved location: %r", location)
+    return location
+
+
+# Identical requests that arrive while one is already running share its result
+classify_flights: SingleFlight[dict] = SingleFlight("classify")
+
+
+def classify_flight_key(
+    image_base64: Optional[str],
+    image_bytes: Optional[bytes],
+    message: Optional[str],
+    location: Optional[str],
+) -> str:
+    """Same normalized input + same coarse location → same key."""
+    if image_bytes is not None:
+        image_key = hashlib.sha256(image_bytes).hexdigest()
+    elif image_base64:
+        image_key = hashlib.sha256(image_base64.encode()).hexdigest()
+    else:
+        image_key = ""
+    return f"{location_key(location)}|{image_key}|{normalize_text(message)}"
+
+
+async def run_classification(
+    image_base64: Optional[str],
+    message: Optional[str],
+    location: Optional[str],
+    image_bytes: Optional[bytes] = None,
+    image_mime_type: Optional[str] = None,
+    user_id: str = "anonymous",
+) -> ClassificationResponse:
+    """Run the compiled agent for one input and wrap the result in a ClassificationResponse."""
+    start_time = time.time()
+
+    async def run_agent() -> dict:
+        # Only the request that actually runs the pipeline takes a fair-queue slot
+        async with fair_queue.slot(user_id):
+            return await agent.ainvoke({
+                "image_base64": image_base64,
+                "image_bytes": image_bytes,
+                "image_mime_type": image_mime_type,
+                "message": message,
+                "location": location,
+            })
+
+    key = classify_flight_key(image_base64, image_bytes, message, location)
+    result = await classify_flights.run(key, run_agent)
+
+    processing_time_ms = (time.time() - start_time) * 1000
+    total_items = len(result["items"])
+    logger.info(
+        "Classification complete — total_items=%d processing_time_ms=%.1f",
+        total_items, processing_time_ms,
+    )
+
+    return ClassificationResponse(
+        items=result["items"],
+        disposal_instructions=result["disposal_instructions"],
+        total_items=total_items,
+        processing_time_ms=processing_time_ms,
+    )
+
+
 @router.post("/classify", response_model=ClassificationResponse)
 async def classify_waste_input(
     request: ClassificationRequest,
@@ -39,11 +131,10 @@ async def classify_waste_input(
     3. We call Gemini twice: classify → disposal advice
     4. FastAPI validates the response against ClassificationResponse and returns JSON
 
-    The 'user' param is injected by the auth dependency — you can use it
-    to log who made the request, rate-limit per user, etc.
+    The 'user' param is injected by the auth dependency and keys the
+    per-user rate limit and fair queue.
     """
-    start_time = time.time()
-
+    await check_rate_limit(user)
     has_image = bool(request.image_base64)
     has_message = bool(request.message)
     logger.info(
@@ -53,42 +144,21 @@ async def classify_waste_input(
 
     try:
         # Determine location: use provided value or fall back to IP geolocation
-        location = request.location
-        if location:
-            logger.info("Using client-provided location: %r", location)
-        else:
-            forwarded_for = raw_request.headers.get("X-Forwarded-For", "")
-            client_ip = forwarded_for.split(",")[0].strip() or raw_request.client.host
-            logger.info(
-                "No location in request — resolving from IP. X-Forwarded-For=%r client.host=%r → using IP=%r",
-                forwarded_for, raw_request.client.host, client_ip,
-            )
-            location = await get_location_from_ip(client_ip)
-            logger.info("IP-resolved location: %r", location)
+        location = await resolve_location(request.location, raw_request)
 
         logger.info("Final location passed to agent: %r", location)
 
         # Invoke agentic loop
-        result = await agent.ainvoke({
-            "image_base64": request.image_base64,
-            "message": request.message,
-            "location": location,
-        })
-
-        processing_time_ms = (time.time() - start_time) * 1000
-        total_items = len(result["items"])
-        logger.info(
-            "Classification complete — total_items=%d processing_time_ms=%.1f",
-            total_items, processing_time_ms,
-        )
+        return await run_classification(request.image_base64, request.message, location, user_id=user_key(user))
 
-        return ClassificationResponse(
-            items=result["items"],
-            disposal_instructions=result["disposal_instructions"],
-            total_items=total_items,
-            processing_time_ms=processing_time_ms,
+    except HTTPException:
+        raise  # e.g. 503 from the fair queue — keep its status and Retry-After
+    except ModelOverloadedError as e:
+        logger.warning("Classification rejected — Gemini overloaded: %s", e)
+        raise HTTPException(
+            status_code=503, detail="Classification is busy — try again shortly",
+            headers={"Retry-After": str(int(e.retry_after))},
         )
-
     except ValueError as e:
         # Config errors (missing API key), JSON parse failures, or input errors
         logger.error("Validation error during classification: %s", e, exc_info=True)
@@ -96,3 +166,243 @@ async def classify_waste_input(
     except Exception as e:
         logger.error("Unexpected error during classification: %s", e, exc_info=True)
         raise HTTPException(status_code=500, detail=f"Classification failed: {e}")
+
+
+async def read_upload(image: UploadFile) -> bytes:
+    """
+    Read an uploaded image into memory, refusing anything over IMAGE_UPLOAD_MAX_BYTES.
+
+    Starlette spools the part to a SpooledTemporaryFile while parsing, so a large
+    upload never sits in memory twice; this is the one copy the pipeline uses.
+    """
+    if image.content_type and not image.content_type.startswith("image/"):
+        raise HTTPException(status_code=415, detail=f"Unsupported upload type {image.content_type!r} — send an image")
+    limit = settings.IMAGE_UPLOAD_MAX_BYTES
+    if image.size is not None and image.size > limit:
+        raise HTTPException(status_code=413, detail=f"Image too large — at most {limit} bytes")
+    data = await image.read(limit + 1)
+    if len(data) > limit:
+        raise HTTPException(status_code=413, detail=f"Image too large — at most {limit} bytes")
+    if not data:
+        raise HTTPException(status_code=422, detail="Uploaded image is empty.")
+    return data
+
+
+@router.post("/classify/upload", response_model=ClassificationResponse)
+async def classify_waste_upload(
+    raw_request: Request,
+    image: UploadFile = File(..., description="Photo of the item(s), JPEG or PNG"),
+    message: Optional[str] = Form(None),
+    location: Optional[str] = Form(None),
+    user: dict = Depends(get_current_user),
+):
+    """
+    Multipart variant of /classify — the photo is uploaded as a binary file part.
+
+    Skips the ~33% base64 inflation and the multi-megabyte JSON parse: the raw
+    bytes go through the graph as-is and are only base64-encoded when the
+    Gemini message is built.
+    """
+    await check_rate_limit(user)
+    image_bytes = await read_upload(image)
+    logger.info(
+        "Classify upload received — image_bytes=%d content_type=%r has_message=%s location_provided=%s",
+        len(image_bytes), image.content_type, bool(message), bool(location),
+    )
+
+    try:
+        location = await resolve_location(location, raw_request)
+        logger.info("Final location passed to agent: %r", location)
+        return await run_classification(
+            None, message, location,
+            image_bytes=image_bytes,
+            image_mime_type=image.content_type or "image/jpeg",
+            user_id=user_key(user),
+        )
+    except HTTPException:
+        raise  # e.g. 503 from the fair queue — keep its status and Retry-After
+    except ModelOverloadedError as e:
+        logger.warning("Classification rejected — Gemini overloaded: %s", e)
+        raise HTTPException(
+            status_code=503, detail="Classification is busy — try again shortly",
+            headers={"Retry-After": str(int(e.retry_after))},
+        )
+    except ValueError as e:
+        logger.error("Validation error during classification: %s", e, exc_info=True)
+        raise HTTPException(status_code=422, detail=str(e))
+    except Exception as e:
+        logger.error("Unexpected error during classification: %s", e, exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Classification failed: {e}")
+    finally:
+        await image.close()
+
+
+@router.post("/classify/batch", response_model=BatchClassificationResponse)
+async def classify_waste_batch(
+    batch: BatchClassificationRequest,
+    raw_request: Request,
+    user: dict = Depends(get_current_user),
+):
+    """
+    Classify many items/photos in one call (kiosks, partner integrations).
+
+    Location is resolved once for every entry that doesn't carry its own. Entries
+    run through the agent concurrently, at most BATCH_MAX_CONCURRENCY at a time,
+    sharing the process-wide caches and HTTP pools. Results come back in request
+    order; a failing entry reports its error without failing the batch.
+    """
+    start_time = time.time()
+    if len(batch.requests) > settings.BATCH_MAX_SIZE:
+        raise HTTPException(status_code=413, detail=f"Batch too large — at most {settings.BATCH_MAX_SIZE} requests")
+    await check_rate_limit(user, cost=len(batch.requests))
+    logger.info("Batch classify request received — entries=%d user=%s", len(batch.requests), user.get("sub"))
+
+    shared_location = None
+    if any(not r.location for r in batch.requests):
+        shared_location = await resolve_location(None, raw_request)
+
+    semaphore = asyncio.Semaphore(settings.BATCH_MAX_CONCURRENCY)
+
+    async def run_entry(index: int, entry: ClassificationRequest) -> BatchClassificationResult:
+        llm_priority.set(Priority.BATCH)  # interactive /classify calls go first
+        async with semaphore:
+            try:
+                if not (entry.image_base64 or entry.message):
+                    raise ValueError("Either an image or a message is required.")
+                result = await run_classification(
+                    entry.image_base64, entry.message, entry.location or shared_location, user_id=user_key(user),
+                )
+                return BatchClassificationResult(index=index, result=result)
+            except HTTPException as e:
+                # Fair queue full (503) — the entry can be retried; the rest of the batch carries on
+                logger.warning("Batch entry %d rejected: %s %s", index, e.status_code, e.detail)
+                retry_after = (e.headers or {}).get("Retry-After")
+                return BatchClassificationResult(
+                    index=index, error=str(e.detail), status_code=e.status_code,
+                    retry_after=int(retry_after) if retry_after else None,
+                )
+            except ModelOverloadedError as e:
+                logger.warning("Batch entry %d rejected — Gemini overloaded: %s", index, e)
+                return BatchClassificationResult(
+                    index=index, error="Classification is busy — try again shortly",
+                    status_code=503, retry_after=int(e.retry_after),
+                )
+            except ValueError as e:
+                logger.error("Batch entry %d failed: %s", index, e, exc_info=True)
+                return BatchClassificationResult(index=index, error=str(e), status_code=422)
+            except Exception as e:
+                logger.error("Batch entry %d failed: %s", index, e, exc_info=True)
+                return BatchClassificationResult(index=index, error=str(e), status_code=500)
+
+    results = await asyncio.gather(*(run_entry(i, r) for i, r in enumerate(batch.requests)))
+    failed = sum(1 for r in results if r.error is not None)
+    processing_time_ms = (time.time() - start_time) * 1000
+    logger.info(
+        "Batch classification complete — entries=%d failed=%d processing_time_ms=%.1f",
+        len(results), failed, processing_time_ms,
+    )
+    return BatchClassificationResponse(
+        results=list(results),
+        total_requests=len(results),
+        succeeded=len(results) - failed,
+        failed=failed,
+        processing_time_ms=processing_time_ms,
+    )
+
+
+def sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+@router.post("/classify/stream")
+async def classify_waste_input_stream(
+    request: ClassificationRequest,
+    raw_request: Request,
+    user: dict = Depends(get_current_user),
+):
+    """
+    Streaming variant of /classify using Server-Sent Events.
+
+    Events, in the order they usually arrive:
+    - items        — classified items, as soon as the classification node finishes
+    - progress     — one per search iteration of the disposal agent (queries issued / results received)
+    - instruction  — each DisposalInstruction as soon as it is ready (cached ones first)
+    - result       — the full ClassificationResponse, same shape as /classify
+    - error        — if the pipeline fails; the stream ends after it
+    """
+    await check_rate_limit(user)
+    start_time = time.time()
+    logger.info(
+        "Streaming classify request received — has_image=%s has_message=%s location_provided=%s",
+        bool(request.image_base64), bool(request.message), bool(request.location),
+    )
+    location = await resolve_location(request.location, raw_request)
+
+    async def event_stream():
+        items = []
+        instructions = []
+        iterations: dict = {}  # per agent namespace — parallel mode runs one loop per item
+        try:
+            async with fair_queue.slot(user_key(user)):
+                # subgraphs=True also surfaces events from the per-item sub-agents in parallel mode
+                async for namespace, mode, chunk in agent.astream(
+                    {"image_base64": request.image_base64, "message": request.message, "location": location},
+                    stream_mode=["updates", "custom"],
+                    subgraphs=True,
+                ):
+                    if mode == "custom":
+                        yield sse_event(chunk["event"], chunk["data"])
+                        continue
+
+                    agent_id = "/".join(namespace) or "main"
+                    for node, update in chunk.items():
+                        if not update:
+                            continue
+                        if node == "disposal_agent":
+                            last = update["messages"][-1] if update.get("messages") else None
+                            if last is not None and getattr(last, "tool_calls", None):
+                                iterations[agent_id] = iterations.get(agent_id, 0) + 1
+                                yield sse_event("progress", {
+                                    "stage": "searching",
+                                    "agent": agent_id,
+                                    "iteration": iterations[agent_id],
+                                    "queries": [tc.get("args", {}).get("query") for tc in last.tool_calls],
+                                })
+                        elif node == "tools":
+                            yield sse_event("progress", {
+                                "stage": "search_results",
+                                "agent": agent_id,
+                                "iteration": iterations.get(agent_id, 0),
+                            })
+                        if namespace:
+                            continue  # sub-agent state — final values come from the top-level graph
+                        if "items" in update:
+                            items = update["items"]
+                            yield sse_event("items", {"items": [i.model_dump() for i in items], "location": location})
+                        if update.get("disposal_instructions") is not None:
+                            instructions = update["disposal_instructions"]
+
+            processing_time_ms = (time.time() - start_time) * 1000
+            logger.info(
+                "Streaming classification complete — total_items=%d processing_time_ms=%.1f",
+                len(items), processing_time_ms,
+            )
+            response = ClassificationResponse(
+                items=items,
+                disposal_instructions=instructions,
+                total_items=len(items),
+                processing_time_ms=processing_time_ms,
+            )
+            yield sse_event("result", response.model_dump())
+        except HTTPException as e:
+            logger.warning("Streaming classification rejected: %s %s", e.status_code, e.detail)
+            yield sse_event("error", {"detail": e.detail, "status_code": e.status_code})
+        except Exception as e:
+            logger.error("Streaming classification failed: %s", e, exc_info=True)
+            yield sse_event("error", {"detail": f"Classification failed: {e}"})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
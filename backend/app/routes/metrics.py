@@ -0,0 +1,53 @@
+"""
+Operational metrics for the backend.
+
+GET /api/v1/metrics — cache hit/miss counters and other runtime stats, for sizing and dashboards
+"""
+
+from fastapi import APIRouter, Depends
+
+from app.core.auth import get_current_user, verified_tokens
+from app.core import rate_limit
+from app.core.jwks import jwks_cache
+from app.database import pool_stats
+from app.routes.classification import classify_flights
+from app.services.agent import cached_search, disposal_cache
+from app.services.busy_cache import busy_cache
+from app.services.calendar_client import calendar_client
+from app.services.facility_store import facility_store
+from app.services.gemini_service import classification_cache
+from app.services.google_auth import google_credentials
+from app.services.http_clients import http_clients
+from app.services.location_service import ip_location_cache
+from app.services.image_cache import image_cache
+from app.services.llm_clients import llm_clients
+from app.services.llm_scheduler import gemini_scheduler
+from app.services import structured_output
+
+router = APIRouter(prefix="/api/v1", tags=["metrics"])
+
+
+@router.get("/metrics")
+async def get_metrics(user: dict = Depends(get_current_user)):
+    return {
+        "caches": {
+            "text_classification": classification_cache.stats(),
+            "image_classification": image_cache.stats(),
+            "disposal_instructions": disposal_cache.stats(),
+            "facilities": facility_store.stats(),
+            "ip_location": ip_location_cache.stats(),
+            "verified_tokens": verified_tokens.stats(),
+            "calendar_busy": busy_cache.stats(),
+        },
+        "classify_coalescing": classify_flights.stats(),
+        "rate_limit": rate_limit.stats(),
+        "gemini_scheduler": gemini_scheduler.stats(),
+        "llm_clients": llm_clients.stats(),
+        "google_calendar": calendar_client.stats(),
+        "google_credentials": google_credentials.stats(),
+        "web_search": cached_search.stats(),
+        "http_pools": http_clients.stats(),
+        "db_pools": pool_stats(),
+        "jwks": jwks_cache.stats(),
+        "model_output_parsing": structured_output.stats(),
+    }
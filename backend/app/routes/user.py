@@ -1,13 +1,15 @@
 # User API routes
 
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel
 from typing import Optional
-from app.database import get_db
+from app.database import get_async_db
 from app.schemas.user import UserCreate, UserResponse
 from app.models.user import User
 from app.core.auth import get_current_user
+from app.services.google_auth import google_credentials
 
 router = APIRouter(prefix="/users", tags=["users"])
 
@@ -17,49 +19,55 @@ class TokenStore(BaseModel):
     google_refresh_token: Optional[str] = None
 
 
+async def get_user_by_id(db: AsyncSession, user_id: str) -> Optional[User]:
+    result = await db.execute(select(User).where(User.id == user_id))
+    return result.scalars().first()
+
+
 @router.get("/me", response_model=UserResponse)
-def get_me(user=Depends(get_current_user), db: Session = Depends(get_db)):
-    db_user = db.query(User).filter(User.id == user["sub"]).first()
+async def get_me(user=Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
+    db_user = await get_user_by_id(db, user["sub"])
     if not db_user:
         raise HTTPException(status_code=404, detail="User not found")
     return db_user
 
 
 @router.post("/", response_model=UserResponse)
-def create_user(user: UserCreate, db: Session = Depends(get_db)):
-    db_user = db.query(User).filter(User.email == user.email).first()
+async def create_user(user: UserCreate, db: AsyncSession = Depends(get_async_db)):
+    result = await db.execute(select(User).where(User.email == user.email))
+    db_user = result.scalars().first()
     if db_user:
         raise HTTPException(status_code=400, detail="Email already registered")
     new_user = User(id=user.id, email=user.email, username=user.username)
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await db.commit()
+    await db.refresh(new_user)
     return new_user
 
 
 @router.patch("/me", response_model=UserResponse)
-def update_me(
+async def update_me(
     updates: dict,
     user=Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    db_user = db.query(User).filter(User.id == user["sub"]).first()
+    db_user = await get_user_by_id(db, user["sub"])
     if not db_user:
         raise HTTPException(status_code=404, detail="User not found")
     for key, value in updates.items():
         setattr(db_user, key, value)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await db.refresh(db_user)
     return db_user
 
 
 @router.post("/store-tokens")
-def store_tokens(
+async def store_tokens(
     tokens: TokenStore,
     user=Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    db_user = db.query(User).filter(User.id == user["sub"]).first()
+    db_user = await get_user_by_id(db, user["sub"])
     if not db_user:
         # First sign-in via Google OAuth — create the user row automatically
         email = user.get("email", "")
@@ -70,5 +78,6 @@ def store_tokens(
     db_user.google_access_token = tokens.google_access_token
     if tokens.google_refresh_token:
         db_user.google_refresh_token = tokens.google_refresh_token
-    db.commit()
+    await db.commit()
+    google_credentials.invalidate(user["sub"])
     return {"status": "tokens stored"}
\ No newline at end of file
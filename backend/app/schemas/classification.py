@@ -31,6 +31,7 @@ class DisposalInstruction(BaseModel):
     material_type: str
     instruction: str = Field(..., description="Plain-language disposal/recycling instructions")
     facilities: List[DisposalFacility] = Field(default_factory=list, description="Nearby disposal facilities")
+    budget_cutoff: bool = Field(default=False, description="True if the agent ran out of its search budget before answering")
 
 
 class ClassificationRequest(BaseModel):
@@ -46,3 +47,25 @@ class ClassificationResponse(BaseModel):
     disposal_instructions: List[DisposalInstruction]
     total_items: int
     processing_time_ms: float
+
+
+class BatchClassificationRequest(BaseModel):
+    """Several classification requests submitted together."""
+    requests: List[ClassificationRequest] = Field(..., min_length=1, description="Entries to classify, in order")
+
+
+class BatchClassificationResult(BaseModel):
+    """Outcome of one batch entry — either a result or an error."""
+    index: int
+    result: Optional[ClassificationResponse] = None
+    error: Optional[str] = None
+    status_code: int = 200                # what /classify would have answered, e.g. 503 when busy
+    retry_after: Optional[int] = None     # seconds, set for retryable (503) entries
+
+
+class BatchClassificationResponse(BaseModel):
+    results: List[BatchClassificationResult]
+    total_requests: int
+    succeeded: int
+    failed: int
+    processing_time_ms: float
@@ -1,18 +1,30 @@
 # LangGraph agent service
 
+import asyncio
 import json
 import logging
+import operator
+import time
 
-from typing import TypedDict, Optional, List, Annotated
+from dataclasses import dataclass
+from typing import TypedDict, Optional, List, Annotated, Tuple
 
 logger = logging.getLogger(__name__)
 from app.schemas.classification import WasteClassificationItem, DisposalInstruction, DisposalFacility
-from app.services.gemini_service import parse_json_response, GeminiClassificationService
+from app.services.cache import TieredCache, location_key, normalize_text
+from app.services.gemini_service import GeminiClassificationService
+from app.services.structured_output import parse_model_list
+from app.services.tool_compaction import compact_tool_messages, estimate_tokens
+from app.services.llm_clients import get_llm
+from app.services.llm_scheduler import Priority, gemini_scheduler
 from app.services.places_service import enrich_facilities
+from app.services.search_cache import CachedSearch
 from langgraph.prebuilt import ToolNode, tools_condition
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_core.messages import BaseMessage, HumanMessage
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, ToolMessage
+from langchain_core.runnables import RunnableConfig
+from langgraph.config import get_stream_writer
 from langgraph.graph import StateGraph, START, END
+from langgraph.types import Send
 from langgraph.graph.message import add_messages
 from langchain_tavily import TavilySearch
 from app.core.config import settings
@@ -21,7 +33,9 @@ from app.core.config import settings
 gemini_service = GeminiClassificationService()
 
 class InputState(TypedDict):
-    image_base64: Optional[str]  # optional image
+    image_base64: Optional[str]  # optional image (JSON requests)
+    image_bytes: Optional[bytes]  # optional image (multipart uploads) — encoded only at the model call
+    image_mime_type: Optional[str]
     message: Optional[str]       # optional text
     location: Optional[str]      # optional location
 
@@ -29,23 +43,49 @@ class OutputState(TypedDict):
     items: List[WasteClassificationItem]
     disposal_instructions: List[DisposalInstruction]
 
+@dataclass
+class SharedBudget:
+    """Tool iterations and tokens spent by all per-item sub-agents of one request (parallel mode)."""
+    tool_iterations: int = 0
+    tokens_used: int = 0
+
 class OverallState(TypedDict):
     # Everything from input
     image_base64: Optional[str]
+    image_bytes: Optional[bytes]
+    image_mime_type: Optional[str]
     message: Optional[str]
     location: Optional[str]
 
     # Intermediate fields only nodes need to see
     items: Optional[List[WasteClassificationItem]]
+    cached_instructions: Optional[List[Optional[DisposalInstruction]]]  # aligned with items; None = cache miss
+    pending_items: Optional[List[WasteClassificationItem]]              # items the agent still has to research
 
     # agentic loop messages
     messages: Annotated[List[BaseMessage], add_messages]  
+
+    # Loop budgets — deadline is a time.monotonic() timestamp set when the disposal phase starts
+    deadline: Optional[float]
+    tokens_used: Optional[int]
+    shared_budget: Optional[SharedBudget]  # parallel mode: iteration/token budgets count across all items
+
+    # Parallel mode: (item index, instructions) from each per-item sub-agent
+    item_results: Annotated[List[Tuple[int, List[DisposalInstruction]]], operator.add]
     
     # Final output fields
     disposal_instructions: Optional[List[DisposalInstruction]]
 
+class ItemTask(TypedDict):
+    """Payload sent to one per-item disposal sub-agent in parallel mode."""
+    index: int
+    item: Optional[WasteClassificationItem]  # None when nothing was classified ("unknown" answer)
+    location: Optional[str]
+    deadline: Optional[float]
+    shared_budget: SharedBudget
+
 # Tavily tool - web search
-search_tool = TavilySearch(
+tavily_tool = TavilySearch(
     max_results=5,
     search_depth="basic",
     include_answer=True,
@@ -53,11 +93,17 @@ search_tool = TavilySearch(
     tavily_api_key=settings.TAVILY_API_KEY
 )
 
-# Gemini model with tool bound
-model_with_tools = ChatGoogleGenerativeAI(
-    model="gemini-2.5-flash",
-    google_api_key=settings.GEMINI_API_KEY,
-).bind_tools([search_tool])
+# Cached wrapper — same name and schema, so Gemini and ToolNode see the same tool
+cached_search = CachedSearch(
+    tavily_tool,
+    max_entries=settings.SEARCH_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.SEARCH_CACHE_TTL_SECONDS,
+)
+search_tool = cached_search.as_tool()
+
+# Gemini model with tool bound; the bare model is used to force a final answer once a budget runs out
+disposal_model = get_llm("disposal")
+model_with_tools = disposal_model.bind_tools([search_tool])
 
 
 DISPOSAL_PROMPT = """\
@@ -100,11 +146,157 @@ Waste items to research:
 {items_json}
 """
 
+BUDGET_EXHAUSTED_PROMPT = """\
+Your research budget for this request is used up ({reason}). Do not search again.
+Using only the information gathered so far, return the final JSON array now in
+exactly the format described above. Where local details are missing, give the
+best general guidance you can.
+"""
+
+
+DEADLINE_REASON = f"{settings.DISPOSAL_DEADLINE_SECONDS}s deadline"
+
+FALLBACK_INSTRUCTION = (
+    "Local disposal rules could not be looked up in time. Check your city or county's "
+    "recycling guide for this item; if it isn't accepted there, put it in the trash."
+)
+FALLBACK_HAZARDOUS_INSTRUCTION = (
+    "Local disposal rules could not be looked up in time. Keep this item out of the trash "
+    "and recycling and take it to a household hazardous waste drop-off; your city or "
+    "county lists the nearest one."
+)
+
+
+def fallback_instructions(items: List[WasteClassificationItem]) -> List[DisposalInstruction]:
+    """Generic instructions for when even the forced final answer doesn't arrive in time."""
+    if not items:
+        return [DisposalInstruction(
+            item_name="unknown",
+            material_type="unknown",
+            instruction="No specific items detected. Please provide more details or try again.",
+            budget_cutoff=True,
+        )]
+    return [
+        DisposalInstruction(
+            item_name=item.item_name,
+            material_type=item.material_type,
+            instruction=FALLBACK_HAZARDOUS_INSTRUCTION if item.is_hazardous else FALLBACK_INSTRUCTION,
+            budget_cutoff=True,
+        )
+        for item in items
+    ]
+
+
+def seconds_left(state: OverallState) -> Optional[float]:
+    """Time until the disposal deadline, or None when there is none — suitable for asyncio.wait_for."""
+    deadline = state.get("deadline")
+    return None if deadline is None else max(0.0, deadline - time.monotonic())
+
+
+def budget_exhausted(state: OverallState) -> Optional[str]:
+    """Return why the disposal loop must stop searching, or None if it may continue."""
+    shared = state.get("shared_budget")
+    if shared is not None:
+        tool_iterations, tokens_used = shared.tool_iterations, shared.tokens_used
+    else:
+        messages = state.get("messages") or []
+        tool_iterations = sum(1 for m in messages if getattr(m, "tool_calls", None))
+        tokens_used = state.get("tokens_used") or 0
+    if tool_iterations >= settings.DISPOSAL_MAX_TOOL_ITERATIONS:
+        return f"max {settings.DISPOSAL_MAX_TOOL_ITERATIONS} search iterations"
+    deadline = state.get("deadline")
+    if deadline is not None and time.monotonic() >= deadline:
+        return DEADLINE_REASON
+    if tokens_used >= settings.DISPOSAL_TOKEN_BUDGET:
+        return f"{settings.DISPOSAL_TOKEN_BUDGET} token budget"
+    return None
+
+
+## Disposal instruction cache
+# Disposal rules depend on what the item is made of and where the user is, not on
+# what they called it — so "water bottle" and "PET soda bottle" share an entry.
+disposal_cache: TieredCache[DisposalInstruction] = TieredCache(
+    name="disposal_instructions",
+    max_entries=settings.DISPOSAL_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.DISPOSAL_CACHE_TTL_SECONDS,
+    dumps=lambda inst: inst.model_dump(),
+    loads=lambda data: DisposalInstruction(**data),
+)
+
+
+def disposal_cache_key(item: WasteClassificationItem, location: Optional[str]) -> str:
+    return "|".join([
+        location_key(location),
+        normalize_text(item.material_type),
+        "hazardous" if item.is_hazardous else "",
+        "soiled" if item.is_soiled else "",
+    ])
+
+
+def merge_disposal_instructions(
+    items: List[WasteClassificationItem],
+    cached: List[Optional[DisposalInstruction]],
+    fresh: List[DisposalInstruction],
+) -> List[DisposalInstruction]:
+    """
+    Put cached and freshly researched instructions back in the original item order.
+
+    Fresh instructions are matched to cache-miss items by item_name, falling back to
+    the order Gemini returned them in. Anything left over (e.g. an "unknown" entry)
+    is appended at the end.
+    """
+    remaining = list(fresh)
+    merged: List[DisposalInstruction] = []
+    for item, hit in zip(items, cached):
+        if hit is not None:
+            merged.append(hit)
+            continue
+        if not remaining:
+            continue
+        name = normalize_text(item.item_name)
+        match = next((inst for inst in remaining if normalize_text(inst.item_name) == name), remaining[0])
+        remaining.remove(match)
+        merged.append(match)
+    return merged + remaining
+
+
+def emit_event(event: str, data: dict) -> None:
+    """
+    Push a custom event to stream_mode="custom" consumers (the SSE classify route).
+    A no-op for plain ainvoke() calls and outside a graph run.
+    """
+    try:
+        writer = get_stream_writer()
+    except Exception:
+        return
+    writer({"event": event, "data": data})
+
+
+async def enrich_instruction(
+    inst: DisposalInstruction, location: Optional[str], budget_cutoff: bool = False,
+) -> DisposalInstruction:
+    """Geocode one parsed instruction's facilities and emit it as soon as it's ready."""
+    raw_facilities = [{"name": f.name, "address": f.address} for f in inst.facilities]
+    logger.debug(
+        "disposal_agent_node: enriching %d facility/ies for item=%r — raw=%s",
+        len(raw_facilities), inst.item_name, raw_facilities,
+    )
+    enriched = await enrich_facilities(raw_facilities, user_location=location)
+    logger.debug(
+        "disposal_agent_node: enriched facilities for item=%r: %s",
+        inst.item_name,
+        [{"name": f.name, "address": f.address, "lat": f.latitude, "lng": f.longitude} for f in enriched],
+    )
+    instruction = inst.model_copy(update={"facilities": enriched, "budget_cutoff": budget_cutoff})
+    emit_event("instruction", {"instruction": instruction.model_dump(), "cached": False})
+    return instruction
+
+
 ## Create nodes
 # First, we will have a router node that decides between text and image classification
 def router_node(state: InputState) -> str:
     location = state.get("location")
-    if state.get("image_base64"):
+    if state.get("image_bytes") or state.get("image_base64"):
         logger.info("Router: image path selected — location=%r", location)
         return "image_classification"
     elif state.get("message"):
@@ -119,8 +311,9 @@ async def image_classification_node(state: OverallState) -> OverallState:
     location = state.get("location")
     logger.info("image_classification_node: starting — location=%r", location)
     items = await gemini_service.classify_image(
-        image_base64=state["image_base64"],
+        state.get("image_bytes") or state["image_base64"],
         user_location=location,
+        mime_type=state.get("image_mime_type") or "image/jpeg",
     )
     logger.info("image_classification_node: classified %d item(s)", len(items))
     return {"items": items}
@@ -135,22 +328,91 @@ async def text_classification_node(state: OverallState) -> OverallState:
     logger.info("text_classification_node: classified %d item(s)", len(items))
     return {"items": items}
 
+async def disposal_cache_node(state: OverallState) -> dict:
+    """
+    Answer items from the disposal cache before the agentic loop runs.
+    Only cache misses are handed to disposal_agent; if everything hits, the loop is skipped.
+    """
+    items = state["items"]
+    location = state.get("location")
+    cached: List[Optional[DisposalInstruction]] = [None] * len(items)
+    if settings.CACHE_ENABLED:
+        hits = await asyncio.gather(*(disposal_cache.aget(disposal_cache_key(item, location)) for item in items))
+        cached = [
+            hit.model_copy(update={"item_name": item.item_name, "material_type": item.material_type})
+            if hit is not None else None
+            for item, hit in zip(items, hits)
+        ]
+
+    for hit in cached:
+        if hit is not None:
+            emit_event("instruction", {"instruction": hit.model_dump(), "cached": True})
+
+    pending = [item for item, hit in zip(items, cached) if hit is None]
+    logger.info(
+        "disposal_cache_node: %d/%d item(s) answered from cache — pending=%s",
+        len(items) - len(pending), len(items), [i.item_name for i in pending],
+    )
+    update = {
+        "cached_instructions": cached,
+        "pending_items": pending,
+        "deadline": time.monotonic() + settings.DISPOSAL_DEADLINE_SECONDS,
+    }
+    if items and not pending:
+        update["disposal_instructions"] = merge_disposal_instructions(items, cached, [])
+    return update
+
+
+def route_after_cache(state: OverallState) -> str:
+    # No items at all still goes to the agent so it can return its "unknown" answer
+    if state.get("pending_items") or not state.get("items"):
+        return "disposal_agent"
+    return END
+
+
+async def store_disposal_instructions(
+    items: List[WasteClassificationItem],
+    instructions: List[DisposalInstruction],
+    location: Optional[str],
+) -> None:
+    """Cache freshly researched instructions for the items they answer."""
+    if not settings.CACHE_ENABLED:
+        return
+    by_name = {normalize_text(inst.item_name): inst for inst in instructions}
+    for item in items:
+        inst = by_name.get(normalize_text(item.item_name))
+        # Answers cut short by a budget are served once but never cached
+        if inst is not None and inst.item_name != "unknown" and not inst.budget_cutoff:
+            await disposal_cache.aset(disposal_cache_key(item, location), inst)
+
+
 async def disposal_agent_node(state: OverallState) -> dict:
     """
     Agentic disposal node. Gemini decides when to call TavilySearch and how many times — looping until it has enough local policy info.
 
     Flow:
     1. First call — Gemini gets items + location, decides to search
-    2. ToolNode executes search, results appended to messages
+    2. ToolNode executes search, results appended to messages and compacted
+       (compact_tool_results_node)
     3. Gemini gets results, may search again for more specific info
     4. When satisfied, Gemini returns final JSON disposal instructions
+
+    Iterations, wall-clock time and tokens are budgeted. Once any budget is spent,
+    Gemini is called without tools and told to answer from what it has gathered;
+    those instructions are flagged with budget_cutoff=True. A tool-calling turn
+    still running at the deadline is cancelled and takes the same path; if the
+    forced answer itself misses DISPOSAL_FINAL_ANSWER_SECONDS, generic
+    instructions (also flagged) are returned instead. In
+    parallel mode the per-item sub-agents share one SharedBudget, so iterations
+    and tokens are counted for the request as a whole.
     """
     existing_messages = state.get("messages") or []
     loop_iteration = len([m for m in existing_messages if hasattr(m, "tool_calls")])
+    cutoff_reason = budget_exhausted(state) if existing_messages else None
 
     # Only build the initial prompt on the first call (no messages yet)
     if not existing_messages:
-        items = state["items"]
+        items = state.get("pending_items") or state["items"]
         location = state.get("location", "Unknown")
 
         logger.info(
@@ -182,11 +444,56 @@ async def disposal_agent_node(state: OverallState) -> dict:
         location = state.get("location", "Unknown")
         logger.info("disposal_agent_node [iter=%d]: continuing agentic loop — location=%r", loop_iteration, location)
 
-    response = await model_with_tools.ainvoke(messages)
+    budget_message = None
+    if not cutoff_reason:
+        try:
+            response = await asyncio.wait_for(
+                gemini_scheduler.call(lambda: model_with_tools.ainvoke(messages), name="disposal_agent"),
+                timeout=seconds_left(state),
+            )
+        except asyncio.TimeoutError:
+            cutoff_reason = DEADLINE_REASON
+    if cutoff_reason:
+        logger.warning("disposal_agent_node [iter=%d]: budget exhausted (%s) — forcing final answer", loop_iteration, cutoff_reason)
+        budget_message = HumanMessage(content=BUDGET_EXHAUSTED_PROMPT.format(reason=cutoff_reason))
+        try:
+            # The budget is already spent: a short grace, no queueing behind batch work, no retries
+            response = await asyncio.wait_for(
+                gemini_scheduler.call(
+                    lambda: disposal_model.ainvoke(messages + [budget_message]),
+                    name="disposal_final", priority=Priority.INTERACTIVE, max_retries=0,
+                ),
+                timeout=settings.DISPOSAL_FINAL_ANSWER_SECONDS,
+            )
+        except asyncio.TimeoutError:
+            logger.warning(
+                "disposal_agent_node [iter=%d]: no final answer within %.1fs — returning generic instructions",
+                loop_iteration, settings.DISPOSAL_FINAL_ANSWER_SECONDS,
+            )
+            items = state["items"]
+            fallback = fallback_instructions(state.get("pending_items") or items)
+            for inst in fallback:
+                emit_event("instruction", {"instruction": inst.model_dump(), "cached": False})
+            cached = state.get("cached_instructions") or [None] * len(items)
+            return {
+                "messages": [m for m in (initial_message, budget_message) if m is not None],
+                "disposal_instructions": merge_disposal_instructions(items, cached, fallback),
+            }
+
+    usage = getattr(response, "usage_metadata", None) or {}
+    tokens_used = (state.get("tokens_used") or 0) + usage.get("total_tokens", 0)
+    shared = state.get("shared_budget")
+    if shared is not None:
+        shared.tokens_used += usage.get("total_tokens", 0)
+        shared.tool_iterations += 1 if response.tool_calls else 0
+    logger.info(
+        "disposal_agent_node [iter=%d]: tokens in=%s out=%s (history ~%d est.) total_so_far=%d",
+        loop_iteration, usage.get("input_tokens"), usage.get("output_tokens"), estimate_tokens(messages), tokens_used,
+    )
 
     # Include the initial HumanMessage in returned messages so the full
     # conversation history is preserved in state for subsequent loop iterations.
-    new_messages = [initial_message, response] if initial_message else [response]
+    new_messages = [m for m in (initial_message, budget_message) if m is not None] + [response]
 
     # Gemini is done searching — parse final JSON response
     if not response.tool_calls:
@@ -201,30 +508,24 @@ async def disposal_agent_node(state: OverallState) -> dict:
                 )
 
             logger.debug("disposal_agent_node: raw Gemini response content: %r", content[:1000] if content else None)
-            instructions_data = parse_json_response(content)
+            parsed = parse_model_list(content, DisposalInstruction)
             location = state.get("location")
 
             logger.info(
                 "disposal_agent_node: parsed %d disposal instruction(s) — enriching facilities with location=%r",
-                len(instructions_data), location,
+                len(parsed), location,
             )
 
-            instructions = []
-            for inst in instructions_data:
-                raw_facilities = inst.pop("facilities", [])
-                logger.debug(
-                    "disposal_agent_node: enriching %d facility/ies for item=%r — raw=%s",
-                    len(raw_facilities), inst.get("item_name"), raw_facilities,
-                )
-                enriched = await enrich_facilities(raw_facilities, user_location=location)
-                logger.debug(
-                    "disposal_agent_node: enriched facilities for item=%r: %s",
-                    inst.get("item_name"),
-                    [{"name": f.name, "address": f.address, "lat": f.latitude, "lng": f.longitude} for f in enriched],
-                )
-                instructions.append(DisposalInstruction(**inst, facilities=enriched))
+            # Enrich every instruction concurrently; each is streamed as soon as its facilities resolve
+            instructions = list(await asyncio.gather(*(
+                enrich_instruction(inst, location, budget_cutoff=bool(cutoff_reason)) for inst in parsed
+            )))
 
-            return {"messages": new_messages, "disposal_instructions": instructions}
+            items = state["items"]
+            cached = state.get("cached_instructions") or [None] * len(items)
+            await store_disposal_instructions(state.get("pending_items") or items, instructions, location)
+            merged = merge_disposal_instructions(items, cached, instructions)
+            return {"messages": new_messages, "disposal_instructions": merged, "tokens_used": tokens_used}
         except Exception as e:
             logger.error("disposal_agent_node: failed to parse disposal instructions: %s", e, exc_info=True)
             raise ValueError(f"Failed to parse disposal instructions: {e}")
@@ -235,30 +536,161 @@ async def disposal_agent_node(state: OverallState) -> dict:
         "disposal_agent_node [iter=%d]: Gemini issued %d tool call(s) — queries=%s",
         loop_iteration, len(response.tool_calls), tool_call_queries,
     )
-    return {"messages": new_messages}
+    return {"messages": new_messages, "tokens_used": tokens_used}
+
+
+search_tool_node = ToolNode([search_tool])
+
+
+async def tools_node(state: OverallState, config: RunnableConfig) -> dict:
+    """
+    ToolNode bounded by the disposal deadline. Searches still running at the
+    deadline are abandoned (the shared search keeps filling the cache) and each
+    tool call gets an error result, so the next disposal_agent turn finds the
+    deadline passed and forces the final answer.
+    """
+    try:
+        return await asyncio.wait_for(search_tool_node.ainvoke(state, config), timeout=seconds_left(state))
+    except asyncio.TimeoutError:
+        last = next((m for m in reversed(state.get("messages") or []) if isinstance(m, AIMessage)), None)
+        tool_calls = last.tool_calls if last is not None else []
+        logger.warning("tools_node: %d search(es) cut off by the %s", len(tool_calls), DEADLINE_REASON)
+        return {"messages": [
+            ToolMessage(
+                content=json.dumps({"query": tc.get("args", {}).get("query"), "error": f"search cut off by the {DEADLINE_REASON}"}),
+                tool_call_id=tc["id"],
+                name=tc["name"],
+                status="error",
+            )
+            for tc in tool_calls
+        ]}
+
+
+def compact_tool_results_node(state: OverallState) -> dict:
+    """
+    Runs between `tools` and `disposal_agent`: dedupes search results by URL, trims
+    snippets and collapses earlier iterations' results (see tool_compaction), so
+    the next call doesn't resend every raw search result.
+    """
+    messages = state.get("messages") or []
+    replacements, before, after = compact_tool_messages(messages, settings.DISPOSAL_SNIPPET_CHARS)
+    if before:
+        logger.info(
+            "compact_tool_results: tool results ~%d → ~%d tokens (-%.0f%%), %d message(s) compacted",
+            before, after, 100 * (before - after) / before, len(replacements),
+        )
+    return {"messages": replacements} if replacements else {}
+
+
+## Parallel mode: one disposal sub-agent per item
+def fan_out_disposal(state: OverallState):
+    """Send each cache-miss item to its own sub-agent; finish straight away if everything hit."""
+    items = state.get("items") or []
+    cached = state.get("cached_instructions") or [None] * len(items)
+    location = state.get("location")
+    deadline = state.get("deadline")
+    # One budget object for every sub-agent, so N items don't get N times the iterations and tokens
+    budget = SharedBudget()
+    if not items:
+        return [Send("item_disposal", {
+            "index": 0, "item": None, "location": location, "deadline": deadline, "shared_budget": budget,
+        })]
+    sends = [
+        Send("item_disposal", {
+            "index": i, "item": item, "location": location, "deadline": deadline, "shared_budget": budget,
+        })
+        for i, (item, hit) in enumerate(zip(items, cached))
+        if hit is None
+    ]
+    logger.info("fan_out_disposal: launching %d per-item sub-agent(s)", len(sends))
+    return sends or END
+
+
+async def item_disposal_node(task: ItemTask, config: RunnableConfig) -> dict:
+    """Run the disposal loop for a single item and report its instructions back by index."""
+    item = task["item"]
+    items = [item] if item is not None else []
+    # Passing config runs the loop as a child of this graph, so its stream events reach the caller
+    result = await disposal_loop.ainvoke({
+        "items": items,
+        "pending_items": items,
+        "cached_instructions": [None] * len(items),
+        "location": task["location"],
+        "deadline": task.get("deadline"),
+        "shared_budget": task["shared_budget"],
+    }, config)
+    return {"item_results": [(task["index"], result["disposal_instructions"])]}
+
+
+def merge_disposal_node(state: OverallState) -> dict:
+    """Reduce per-item results back into disposal_instructions in the original item order."""
+    items = state.get("items") or []
+    cached = state.get("cached_instructions") or [None] * len(items)
+    fresh = [inst for _, insts in sorted(state.get("item_results") or [], key=lambda r: r[0]) for inst in insts]
+    return {"disposal_instructions": merge_disposal_instructions(items, cached, fresh)}
 
 
 ## Create StateGraph
-graph = StateGraph(OverallState, input=InputState, output=OutputState)
+def add_disposal_loop(g: StateGraph) -> None:
+    """disposal_agent ⇄ tools (→ compact_tool_results) agentic loop, ending when Gemini stops calling tools."""
+    g.add_node("disposal_agent", disposal_agent_node)
+    g.add_node("tools", tools_node)
+    g.add_conditional_edges("disposal_agent", tools_condition, {
+        "tools": "tools",
+        END: END,
+    })
+    if settings.DISPOSAL_COMPACT_TOOL_RESULTS:
+        g.add_node("compact_tool_results", compact_tool_results_node)
+        g.add_edge("tools", "compact_tool_results")
+        g.add_edge("compact_tool_results", "disposal_agent")
+    else:
+        g.add_edge("tools", "disposal_agent")
+
+
+# Standalone loop, invoked once per item by item_disposal_node in parallel mode
+disposal_loop_graph = StateGraph(OverallState)
+add_disposal_loop(disposal_loop_graph)
+disposal_loop_graph.add_edge(START, "disposal_agent")
+disposal_loop = disposal_loop_graph.compile()
 
-graph.add_node("image_classification", image_classification_node)
-graph.add_node("text_classification", text_classification_node)
-graph.add_node("disposal_agent", disposal_agent_node)
-graph.add_node("tools", ToolNode([search_tool]))
 
-graph.add_conditional_edges(START, router_node, {
-    "image_classification": "image_classification",
-    "text_classification": "text_classification"
-})
+def build_graph(parallel: bool) -> StateGraph:
+    """
+    Full pipeline. In sequential mode one Gemini conversation researches every
+    pending item; in parallel mode each item gets its own sub-agent via Send.
+    """
+    graph = StateGraph(OverallState, input=InputState, output=OutputState)
+
+    graph.add_node("image_classification", image_classification_node)
+    graph.add_node("text_classification", text_classification_node)
+    graph.add_node("disposal_cache", disposal_cache_node)
+
+    graph.add_conditional_edges(START, router_node, {
+        "image_classification": "image_classification",
+        "text_classification": "text_classification"
+    })
+
+    graph.add_edge("image_classification", "disposal_cache")
+    graph.add_edge("text_classification", "disposal_cache")
+
+    if parallel:
+        graph.add_node("item_disposal", item_disposal_node)
+        graph.add_node("merge_disposal", merge_disposal_node)
+        graph.add_conditional_edges("disposal_cache", fan_out_disposal, ["item_disposal", END])
+        graph.add_edge("item_disposal", "merge_disposal")
+        graph.add_edge("merge_disposal", END)
+    else:
+        # Skip the agentic loop entirely when every item was answered from cache
+        graph.add_conditional_edges("disposal_cache", route_after_cache, {
+            "disposal_agent": "disposal_agent",
+            END: END,
+        })
+        add_disposal_loop(graph)
+
+    return graph
 
-graph.add_edge("image_classification", "disposal_agent")
-graph.add_edge("text_classification", "disposal_agent")
 
-# Agentic loop
-graph.add_conditional_edges("disposal_agent", tools_condition, {
-    "tools": "tools",
-    END: END,
-})
-graph.add_edge("tools", "disposal_agent")
+graph = build_graph(parallel=settings.DISPOSAL_PARALLEL)
 
-agent = graph.compile()
\ No newline at end of file
+# max_concurrency caps how many per-item sub-agents run at once within a request
+agent = graph.compile().with_config(max_concurrency=settings.DISPOSAL_MAX_CONCURRENCY)
@@ -0,0 +1,118 @@
+"""
+Per-user cache of busy intervals from Google Calendar.
+
+A drop-off planning session calls /schedule/suggest several times in a few
+minutes; only the first should reach Google. Each user's entry holds:
+- the window it covers (start, end)
+- its busy intervals as one flat array('d') of UTC timestamps
+  [start0, end0, start1, end1, ...], sorted and non-overlapping
+
+Misses run one Calendar FreeBusy query for the whole window (Google merges the
+intervals and drops "free" events for us); FreeBusy has no incremental form,
+so there are no partial updates. Entries are filled one TTL past the requested
+end: callers ask for [now, now + 7 days), so the window slides forward with
+the clock, and the extra margin keeps every repeat call within the TTL a hit.
+Events we create ourselves are added to the entry directly. Entries expire
+after CALENDAR_BUSY_CACHE_TTL_SECONDS so edits made elsewhere show up quickly.
+"""
+import logging
+from array import array
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Tuple
+
+from google.oauth2.credentials import Credentials
+
+from app.core.config import settings
+from app.services.cache import SingleFlight, TTLCache
+from app.services.calendar_client import calendar_client
+
+logger = logging.getLogger(__name__)
+
+Interval = Tuple[datetime, datetime]
+
+
+def _pack(intervals: Iterable[Interval]) -> array:
+    """Sort + merge intervals into a flat timestamp array."""
+    merged: List[List[float]] = []
+    for start, end in sorted((s.timestamp(), e.timestamp()) for s, e in intervals):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return array("d", (t for pair in merged for t in pair))
+
+
+def _unpack(flat: array) -> List[Interval]:
+    return [
+        (datetime.fromtimestamp(flat[i], timezone.utc), datetime.fromtimestamp(flat[i + 1], timezone.utc))
+        for i in range(0, len(flat), 2)
+    ]
+
+
+@dataclass
+class BusyEntry:
+    start: datetime
+    end: datetime
+    busy: array
+
+    def intervals(self, start: datetime, end: datetime) -> List[Interval]:
+        lo, hi = start.timestamp(), end.timestamp()
+        return [(s, e) for s, e in _unpack(self.busy) if e.timestamp() > lo and s.timestamp() < hi]
+
+    def add(self, intervals: Iterable[Interval]) -> None:
+        self.busy = _pack(_unpack(self.busy) + list(intervals))
+
+
+class BusyCache:
+    def __init__(self, max_users: int, ttl_seconds: float):
+        self._entries: TTLCache[BusyEntry] = TTLCache("calendar_busy", max_users, ttl_seconds=ttl_seconds)
+        self._flights: SingleFlight[BusyEntry] = SingleFlight("calendar_busy")
+        self.margin = timedelta(seconds=ttl_seconds)
+        self.fetches = 0
+
+    async def _fetch(
+        self, user_id: str, start: datetime, end: datetime,
+        load_creds: Callable[[], Awaitable[Credentials]],
+    ) -> BusyEntry:
+        creds = await load_creds()
+        fill_end = end + self.margin
+        busy = await calendar_client.free_busy(user_id, creds, start, fill_end)
+        entry = BusyEntry(start=start, end=fill_end, busy=_pack(busy))
+        self._entries.set(user_id, entry)
+        self.fetches += 1
+        logger.info("Busy cache fill — user=%s intervals=%d", user_id, len(busy))
+        return entry
+
+    async def get_busy(
+        self, user_id: str, start: datetime, end: datetime,
+        load_creds: Callable[[], Awaitable[Credentials]],
+    ) -> List[Interval]:
+        """
+        Busy intervals overlapping [start, end). load_creds() is only awaited when
+        Google has to be called, so a cache hit needs no DB read or token refresh.
+        """
+        entry = self._entries.get(user_id)
+        if entry is None or not (entry.start <= start and entry.end >= end):
+            entry = await self._flights.run(user_id, lambda: self._fetch(user_id, start, end, load_creds))
+        return entry.intervals(start, end)
+
+    def add_busy(self, user_id: str, start: datetime, end: datetime) -> None:
+        """Record an event we just created, so the next suggestion already avoids it."""
+        entry = self._entries.peek(user_id)
+        if entry is not None:
+            entry.add([(start, end)])
+
+    def invalidate(self, user_id: str) -> None:
+        self._entries.delete(user_id)
+
+    def stats(self) -> Dict[str, Any]:
+        stats = self._entries.stats()
+        stats["fetches"] = self.fetches
+        return stats
+
+
+busy_cache = BusyCache(
+    max_users=settings.CALENDAR_BUSY_CACHE_MAX_USERS,
+    ttl_seconds=settings.CALENDAR_BUSY_CACHE_TTL_SECONDS,
+)
@@ -0,0 +1,389 @@
+"""
+Shared caching primitives used by the classification and disposal pipeline.
+
+- TTLCache     — in-process LRU with per-entry TTL, a size cap and hit/miss counters
+- SQLiteStore  — small on-disk key/value table so cached answers survive restarts
+- TieredCache  — TTLCache in front of an optional SQLiteStore
+- SingleFlight — identical concurrent async calls share one execution
+
+Plus the key helpers that make near-identical requests land on the same entry:
+normalize_text() and location_key().
+"""
+import asyncio
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Dict, Generic, Iterator, Optional, Tuple, TypeVar
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+V = TypeVar("V")
+
+_PUNCTUATION_RE = re.compile(r"[^\w\s#]")
+_WHITESPACE_RE = re.compile(r"\s+")
+_ZIP_RE = re.compile(r"\b\d{5}(?:-\d{4})?\b")
+
+
+# ── Key helpers ──────────────────────────────────────────────────────────────
+
+def _fold_plural(word: str) -> str:
+    """Very small English plural folder: batteries → battery, boxes → box, cans → can."""
+    if len(word) <= 3 or not word.isalpha():
+        return word
+    if word.endswith("ies"):
+        return word[:-3] + "y"
+    if word.endswith(("ses", "xes", "zes", "ches", "shes")):
+        return word[:-2]
+    if word.endswith("s") and not word.endswith(("ss", "us", "is")):
+        return word[:-1]
+    return word
+
+
+def normalize_text(text: Optional[str], fold_plurals: bool = True) -> str:
+    """
+    Normalize free text for use in a cache key.
+
+    Lower-cases, drops punctuation (keeping '#' so "PET #1" survives), collapses
+    whitespace and optionally folds simple plurals.
+    """
+    if not text:
+        return ""
+    cleaned = _PUNCTUATION_RE.sub(" ", text.lower())
+    words = _WHITESPACE_RE.sub(" ", cleaned).strip().split(" ")
+    if fold_plurals:
+        words = [_fold_plural(w) for w in words]
+    return " ".join(w for w in words if w)
+
+
+def location_key(location: Optional[str]) -> str:
+    """
+    Coarse region key for a location string.
+
+    "Marietta, GA 30062, US" and "marietta ga" both map to "marietta ga" — the
+    city/region pair is what disposal rules actually vary by. A bare ZIP ("30062")
+    is kept as the key, so it doesn't collide with "no location".
+    """
+    if not location:
+        return ""
+    without_zip = _ZIP_RE.sub(" ", location)
+    parts = [normalize_text(p, fold_plurals=False) for p in without_zip.split(",")]
+    parts = [p for p in parts if p]
+    if not parts:
+        zips = _ZIP_RE.findall(location)
+        return zips[0][:5] if zips else ""
+    if len(parts) == 1:
+        return parts[0]
+    return " ".join(parts[:2])
+
+
+# ── In-memory tier ───────────────────────────────────────────────────────────
+
+class TTLCache(Generic[V]):
+    """LRU cache with a size cap and a per-entry time-to-live."""
+
+    def __init__(
+        self,
+        name: str,
+        max_entries: int,
+        ttl_seconds: float,
+        on_evict: Optional[Callable[[str, V], None]] = None,
+    ):
+        self.name = name
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._on_evict = on_evict
+        self._data: "OrderedDict[str, Tuple[float, V]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[V]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                self.misses += 1
+                if self._on_evict:
+                    self._on_evict(key, value)
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def peek(self, key: str, touch: bool = False) -> Optional[V]:
+        """Like get() but leaves the hit/miss counters alone; only refreshes LRU order if touch=True."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] <= time.monotonic():
+                return None
+            if touch:
+                self._data.move_to_end(key)
+            return entry[1]
+
+    def set(self, key: str, value: V, ttl_seconds: Optional[float] = None) -> None:
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        if ttl <= 0 or self.max_entries <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                evicted_key, (_, evicted_value) = self._data.popitem(last=False)
+                self.evictions += 1
+                if self._on_evict:
+                    self._on_evict(evicted_key, evicted_value)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+# ── Persistent tier ──────────────────────────────────────────────────────────
+
+class SQLiteStore:
+    """
+    JSON key/value store in a local SQLite file, one table per namespace.
+
+    Rows carry an absolute (wall-clock) expiry so they stay valid across restarts.
+    Each call opens a short-lived connection, which keeps the store safe to use
+    from the event loop and from worker threads alike.
+    """
+
+    def __init__(self, path: str, namespace: str):
+        if not re.fullmatch(r"\w+", namespace):
+            raise ValueError(f"Invalid cache namespace: {namespace!r}")
+        self.path = path
+        self.table = f"cache_{namespace}"
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {self.table} ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+        self.purge_expired()
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.path, timeout=1.0)
+        try:
+            conn.execute("PRAGMA synchronous=NORMAL")
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get(self, key: str) -> Optional[Tuple[Any, float]]:
+        """Return (value, seconds_left) for a live row, or None."""
+        with self._connect() as conn:
+            row = conn.execute(
+                f"SELECT value, expires_at FROM {self.table} WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        value, expires_at = row
+        remaining = expires_at - time.time()
+        if remaining <= 0:
+            return None
+        return json.loads(value), remaining
+
+    def set(self, key: str, value: Any, ttl_seconds: float) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value), time.time() + ttl_seconds),
+            )
+
+    def delete(self, key: str) -> None:
+        with self._connect() as conn:
+            conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+
+    def purge_expired(self) -> int:
+        with self._connect() as conn:
+            cur = conn.execute(f"DELETE FROM {self.table} WHERE expires_at <= ?", (time.time(),))
+            return cur.rowcount
+
+
+# ── Combined ─────────────────────────────────────────────────────────────────
+
+class TieredCache(Generic[V]):
+    """
+    TTLCache backed by an optional SQLiteStore.
+
+    `dumps` turns a value into something JSON-serializable for the disk tier and
+    `loads` turns it back; disk hits are promoted into memory with their remaining TTL.
+    Disk errors are logged and treated as misses — the cache must never break a request.
+
+    Async code uses aget()/aset(): memory is checked inline and SQLite runs in a
+    worker thread, so a disk miss or write never blocks the event loop. get()/set()
+    do the same work synchronously, for code already off the loop.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_entries: int,
+        ttl_seconds: float,
+        dumps: Callable[[V], Any],
+        loads: Callable[[Any], V],
+        persistent: bool = True,
+    ):
+        self.name = name
+        self.ttl_seconds = ttl_seconds
+        self.memory: TTLCache[V] = TTLCache(name, max_entries, ttl_seconds)
+        self._dumps = dumps
+        self._loads = loads
+        self.disk_hits = 0
+        self.store: Optional[SQLiteStore] = None
+        if persistent and settings.CACHE_DB_PATH:
+            try:
+                self.store = SQLiteStore(settings.CACHE_DB_PATH, name)
+            except Exception as e:
+                logger.warning("Cache %s: persistent tier disabled — %s", name, e)
+
+    def _disk_get(self, key: str) -> Optional[V]:
+        if self.store is None:
+            return None
+        try:
+            row = self.store.get(key)
+        except Exception as e:
+            logger.warning("Cache %s: disk read failed for key=%r — %s", self.name, key, e)
+            return None
+        if row is None:
+            return None
+        raw, remaining = row
+        try:
+            value = self._loads(raw)
+        except Exception as e:
+            logger.warning("Cache %s: dropping unreadable disk entry key=%r — %s", self.name, key, e)
+            self.store.delete(key)
+            return None
+        self.disk_hits += 1
+        self.memory.set(key, value, ttl_seconds=remaining)
+        return value
+
+    def _disk_set(self, key: str, value: V, ttl: float) -> None:
+        if self.store is None:
+            return
+        try:
+            self.store.set(key, self._dumps(value), ttl)
+        except Exception as e:
+            logger.warning("Cache %s: disk write failed for key=%r — %s", self.name, key, e)
+
+    def get(self, key: str) -> Optional[V]:
+        value = self.memory.get(key)
+        if value is not None or self.store is None:
+            return value
+        return self._disk_get(key)
+
+    async def aget(self, key: str) -> Optional[V]:
+        value = self.memory.get(key)
+        if value is not None or self.store is None:
+            return value
+        return await asyncio.to_thread(self._disk_get, key)
+
+    def set(self, key: str, value: V, ttl_seconds: Optional[float] = None) -> None:
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        self.memory.set(key, value, ttl_seconds=ttl)
+        self._disk_set(key, value, ttl)
+
+    async def aset(self, key: str, value: V, ttl_seconds: Optional[float] = None) -> None:
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        self.memory.set(key, value, ttl_seconds=ttl)
+        if self.store is not None:
+            await asyncio.to_thread(self._disk_set, key, value, ttl)
+
+    def stats(self) -> Dict[str, Any]:
+        stats = self.memory.stats()
+        # A disk hit was first counted as a memory miss — report it as a hit overall.
+        stats["disk_hits"] = self.disk_hits
+        stats["misses"] -= self.disk_hits
+        stats["hits"] += self.disk_hits
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_ratio"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+        stats["persistent"] = self.store is not None
+        return stats
+
+
+# ── Single-flight ────────────────────────────────────────────────────────────
+
+class SingleFlight(Generic[V]):
+    """
+    Coalesces identical concurrent calls: the first caller for a key starts the
+    work as its own task, later callers with the same key await that task.
+
+    Every caller awaits through asyncio.shield, so a caller that is cancelled
+    (client disconnect) only stops waiting — the shared run keeps going for the
+    others, and still finishes and fills the caches if nobody is left.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._inflight: Dict[str, "asyncio.Future[V]"] = {}
+        self.executions = 0
+        self.coalesced = 0
+
+    def in_flight(self, key: str) -> bool:
+        """Whether run(key, ...) would join an existing run rather than start one."""
+        return key in self._inflight
+
+    async def run(self, key: str, fn: Callable[[], Awaitable[V]]) -> V:
+        future = self._inflight.get(key)
+        if future is not None:
+            self.coalesced += 1
+            logger.info("SingleFlight %s — joining in-flight run for key=%r", self.name, key[:80])
+            return await asyncio.shield(future)
+
+        future = asyncio.ensure_future(fn())
+        self.executions += 1
+        self._inflight[key] = future
+        future.add_done_callback(lambda f: self._finish(key, f))
+        return await asyncio.shield(future)
+
+    def _finish(self, key: str, future: "asyncio.Future[V]") -> None:
+        if self._inflight.get(key) is future:
+            del self._inflight[key]
+        if not future.cancelled():
+            future.exception()  # mark retrieved — every waiter may have gone away
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.executions + self.coalesced
+        return {
+            "in_flight": len(self._inflight),
+            "executions": self.executions,
+            "coalesced": self.coalesced,
+            "coalesced_ratio": round(self.coalesced / total, 4) if total else 0.0,
+        }
@@ -0,0 +1,129 @@
+"""
+Google Calendar access for the calendar routes.
+
+googleapiclient is synchronous (httplib2 underneath), so:
+- the calendar v3 discovery document is loaded once from the static copy that
+  ships with google-api-python-client and parsed once — no discovery fetch and
+  no JSON parse per request
+- each user's service object (an authorized httplib2 session) is cached and
+  reused while their access token is unchanged
+- every .execute() runs in a worker thread, serialized per user because
+  httplib2 connections are not thread-safe — a slow Google call only holds up
+  that user, never the event loop
+"""
+import asyncio
+import json
+import logging
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from google.oauth2.credentials import Credentials
+from googleapiclient import discovery_cache
+from googleapiclient.discovery import build, build_from_document
+
+from app.core.config import settings
+from app.services.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+_discovery_doc: Optional[Dict[str, Any]] = None
+
+
+def calendar_discovery_doc() -> Optional[Dict[str, Any]]:
+    """The calendar v3 discovery document, parsed once. None if the static copy is missing."""
+    global _discovery_doc
+    if _discovery_doc is None:
+        raw = discovery_cache.get_static_doc("calendar", "v3")
+        if raw is None:
+            logger.warning("No static calendar v3 discovery document — falling back to build()")
+            return None
+        _discovery_doc = json.loads(raw)
+    return _discovery_doc
+
+
+@dataclass
+class CalendarSession:
+    service: Any
+    token: Optional[str]
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+
+
+class CalendarClient:
+    def __init__(self, max_sessions: int, session_ttl_seconds: float):
+        self._sessions: TTLCache[CalendarSession] = TTLCache(
+            "calendar_sessions", max_sessions, ttl_seconds=session_ttl_seconds,
+        )
+        self.calls = 0
+        self.errors = 0
+        self.call_seconds = 0.0
+
+    def _session(self, user_id: str, creds: Credentials) -> CalendarSession:
+        session = self._sessions.get(user_id)
+        if session is not None and session.token == creds.token:
+            return session
+        doc = calendar_discovery_doc()
+        if doc is not None:
+            service = build_from_document(doc, credentials=creds)
+        else:
+            service = build("calendar", "v3", credentials=creds, cache_discovery=False)
+        if session is not None:
+            # Keep the lock so calls already queued for this user stay serialized
+            session.service, session.token = service, creds.token
+        else:
+            session = CalendarSession(service=service, token=creds.token)
+            self._sessions.set(user_id, session)
+        return session
+
+    async def _execute(self, user_id: str, session: CalendarSession, request: Any, name: str) -> Dict[str, Any]:
+        start = time.perf_counter()
+        async with session.lock:
+            try:
+                return await asyncio.to_thread(request.execute)
+            except Exception:
+                self.errors += 1
+                raise
+            finally:
+                elapsed = time.perf_counter() - start
+                self.calls += 1
+                self.call_seconds += elapsed
+                logger.info("Google Calendar %s — user=%s elapsed_ms=%.1f", name, user_id, elapsed * 1000)
+
+    async def free_busy(
+        self, user_id: str, creds: Credentials, time_min: datetime, time_max: datetime,
+    ) -> List[Tuple[datetime, datetime]]:
+        """Busy (start, end) intervals on the primary calendar — Google has already merged them and dropped free events."""
+        session = self._session(user_id, creds)
+        request = session.service.freebusy().query(body={
+            "timeMin": time_min.isoformat(),
+            "timeMax": time_max.isoformat(),
+            "items": [{"id": "primary"}],
+        })
+        result = await self._execute(user_id, session, request, "freebusy.query")
+        calendar = result.get("calendars", {}).get("primary", {})
+        if calendar.get("errors"):
+            raise RuntimeError(f"FreeBusy query failed: {calendar['errors']}")
+        return [
+            (datetime.fromisoformat(b["start"].replace("Z", "+00:00")), datetime.fromisoformat(b["end"].replace("Z", "+00:00")))
+            for b in calendar.get("busy", [])
+        ]
+
+    async def insert_event(self, user_id: str, creds: Credentials, event: Dict[str, Any]) -> Dict[str, Any]:
+        session = self._session(user_id, creds)
+        request = session.service.events().insert(calendarId="primary", body=event)
+        return await self._execute(user_id, session, request, "events.insert")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "avg_call_ms": round(self.call_seconds / self.calls * 1000, 1) if self.calls else 0.0,
+            "sessions": self._sessions.stats(),
+        }
+
+
+calendar_client = CalendarClient(
+    max_sessions=settings.CALENDAR_SESSION_CACHE_SIZE,
+    session_ttl_seconds=settings.CALENDAR_SESSION_TTL_SECONDS,
+)
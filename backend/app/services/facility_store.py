@@ -0,0 +1,151 @@
+"""
+Persistent store of Google Places lookups for disposal facilities.
+
+The same county transfer stations come back from Gemini over and over, so
+enrich_facility() checks here before calling the Places API:
+- in-process LRU keyed on normalized (name, address)
+- Postgres facility_cache table behind it, shared by every worker
+- "no places found" answers are cached too, with a shorter lifetime
+
+Database errors are logged and treated as misses — enrichment must never fail
+because the cache is unavailable.
+"""
+import asyncio
+import logging
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from app.core.config import settings
+from app.database import SessionLocal
+from app.models.facility import FacilityCache
+from app.schemas.classification import DisposalFacility
+from app.services.cache import TTLCache, normalize_text
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class FacilityLookup:
+    """A cached Places answer. facility is None when Places had no match."""
+    facility: Optional[DisposalFacility]
+    fetched_at: datetime
+
+    @property
+    def found(self) -> bool:
+        return self.facility is not None
+
+
+def facility_key(name: str, address: str) -> str:
+    return f"{normalize_text(name, fold_plurals=False)}|{normalize_text(address, fold_plurals=False)}"
+
+
+def _max_age(found: bool) -> timedelta:
+    if found:
+        return timedelta(days=settings.FACILITY_CACHE_MAX_AGE_DAYS)
+    return timedelta(hours=settings.FACILITY_NEGATIVE_CACHE_HOURS)
+
+
+def _is_fresh(lookup: FacilityLookup) -> bool:
+    return datetime.now(timezone.utc) - lookup.fetched_at < _max_age(lookup.found)
+
+
+def _seconds_left(lookup: FacilityLookup) -> float:
+    return (lookup.fetched_at + _max_age(lookup.found) - datetime.now(timezone.utc)).total_seconds()
+
+
+def _row_to_lookup(row: FacilityCache) -> FacilityLookup:
+    fetched_at = row.fetched_at
+    if fetched_at.tzinfo is None:
+        fetched_at = fetched_at.replace(tzinfo=timezone.utc)
+    facility = None
+    if row.found:
+        facility = DisposalFacility(
+            name=row.name,
+            address=row.address,
+            latitude=row.latitude,
+            longitude=row.longitude,
+            place_id=row.place_id,
+            phone=row.phone,
+            rating=row.rating,
+            website=row.website,
+        )
+    return FacilityLookup(facility=facility, fetched_at=fetched_at)
+
+
+class FacilityStore:
+    def __init__(self, max_entries: int):
+        self._by_key: TTLCache[FacilityLookup] = TTLCache(
+            "facility_lookup", max_entries, ttl_seconds=_max_age(True).total_seconds(),
+        )
+        self.db_hits = 0
+        self.db_errors = 0
+
+    def _remember(self, key: str, lookup: FacilityLookup) -> None:
+        self._by_key.set(key, lookup, ttl_seconds=_seconds_left(lookup))
+
+    # ── Sync DB access (run in a worker thread) ─────────────────────────────
+
+    def _load(self, key: str) -> Optional[FacilityLookup]:
+        with SessionLocal() as db:
+            row = db.get(FacilityCache, key)
+            return _row_to_lookup(row) if row is not None else None
+
+    def _save(self, key: str, name: str, address: str, lookup: FacilityLookup) -> None:
+        facility = lookup.facility
+        with SessionLocal() as db:
+            db.merge(FacilityCache(
+                lookup_key=key,
+                place_id=facility.place_id if facility else None,
+                found=facility is not None,
+                name=facility.name if facility else name,
+                address=facility.address if facility else address,
+                latitude=facility.latitude if facility else None,
+                longitude=facility.longitude if facility else None,
+                phone=facility.phone if facility else None,
+                rating=facility.rating if facility else None,
+                website=facility.website if facility else None,
+                fetched_at=lookup.fetched_at,
+            ))
+            db.commit()
+
+    # ── Public API ──────────────────────────────────────────────────────────
+
+    async def get(self, name: str, address: str) -> Optional[FacilityLookup]:
+        """Return a fresh cached lookup for this (name, address), or None if Places must be called."""
+        key = facility_key(name, address)
+        lookup = self._by_key.get(key)
+        if lookup is not None and _is_fresh(lookup):
+            return lookup
+
+        try:
+            lookup = await asyncio.to_thread(self._load, key)
+        except Exception as e:
+            self.db_errors += 1
+            logger.warning("Facility store read failed for key=%r: %s", key, e)
+            return None
+        if lookup is None or not _is_fresh(lookup):
+            return None
+        self.db_hits += 1
+        self._remember(key, lookup)
+        return lookup
+
+    async def put(self, name: str, address: str, facility: Optional[DisposalFacility]) -> None:
+        """Record a Places answer; pass facility=None to negatively cache an empty result."""
+        key = facility_key(name, address)
+        lookup = FacilityLookup(facility=facility, fetched_at=datetime.now(timezone.utc))
+        self._remember(key, lookup)
+        try:
+            await asyncio.to_thread(self._save, key, name, address, lookup)
+        except Exception as e:
+            self.db_errors += 1
+            logger.warning("Facility store write failed for key=%r: %s", key, e)
+
+    def stats(self) -> dict:
+        stats = self._by_key.stats()
+        stats["db_hits"] = self.db_hits
+        stats["db_errors"] = self.db_errors
+        return stats
+
+
+facility_store = FacilityStore(max_entries=settings.FACILITY_CACHE_MAX_ENTRIES)
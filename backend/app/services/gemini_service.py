@@ -5,15 +5,23 @@ Two-step pipeline:
 1. classify_image()  — sends photo to Gemini, gets structured item data (JSON)
 2. get_disposal_instructions() — sends that data back to Gemini, gets human-readable disposal advice
 """
-import json
+import asyncio
+import base64
+import binascii
 import logging
-from typing import Dict, List, Optional
+from typing import List, Optional, Union
 
-from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.messages import HumanMessage
+from PIL import Image
 
 from app.core.config import settings
 from app.schemas.classification import WasteClassificationItem
+from app.services.cache import TieredCache, location_key, normalize_text
+from app.services.image_cache import fingerprint_image, image_cache
+from app.services.image_preprocess import preprocess_image
+from app.services.llm_clients import get_llm
+from app.services.llm_scheduler import gemini_scheduler
+from app.services.structured_output import parse_model_list
 
 logger = logging.getLogger(__name__)
 
@@ -47,31 +55,38 @@ If multiple items are identified, return one object per item.\
 """
 
 
+# ── Cache ────────────────────────────────────────────────────────────────────
+# Text classifications keyed on the normalized message + coarse location, so
+# "Old AA batteries" and "old aa battery." from the same city share one answer.
+classification_cache: TieredCache[List[WasteClassificationItem]] = TieredCache(
+    name="text_classification",
+    max_entries=settings.CLASSIFICATION_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.CLASSIFICATION_CACHE_TTL_SECONDS,
+    dumps=lambda items: [i.model_dump() for i in items],
+    loads=lambda data: [WasteClassificationItem(**i) for i in data],
+)
+
+
+def text_cache_key(message: str, user_location: Optional[str]) -> str:
+    return f"{location_key(user_location)}|{normalize_text(message)}"
+
+
 # ── Service ──────────────────────────────────────────────────────────────────
-def parse_json_response(text: str) -> List[Dict]:
-    """
-    Parse JSON from Gemini's response, stripping markdown code fences if present.
-
-    Gemini sometimes wraps JSON in ```json ... ``` even when told not to.
-    This handles that gracefully.
-    """
-    cleaned = text.strip()
-
-    # Strip markdown code fences
-    had_fences = cleaned.startswith("```")
-    if had_fences:
-        # Remove first line (```json or ```) and last line (```)
-        lines = cleaned.split("\n")
-        cleaned = "\n".join(lines[1:-1]).strip()
-        logger.debug("Stripped markdown fences from Gemini response")
-
-    try:
-        result = json.loads(cleaned)
-        logger.debug("Parsed %d item(s) from Gemini JSON response", len(result) if isinstance(result, list) else 1)
-        return result
-    except json.JSONDecodeError as e:
-        logger.error("JSON parse error — had_fences=%s raw_text=%r error=%s", had_fences, text[:500], e)
-        raise
+def normalize_base64(image_base64: str) -> str:
+    """Strip a data URI prefix and fix missing padding on a base64 image string."""
+    # Cameras/browsers sometimes send "data:image/jpeg;base64,/9j/4AAQ..."
+    # We only want the part after the comma.
+    if "," in image_base64[:100]:
+        image_base64 = image_base64.split(",", 1)[1]
+        logger.debug("Stripped data URI prefix from image_base64")
+
+    # Fix padding — base64 strings must be a multiple of 4 chars.
+    # If truncated, adding "=" padding fixes it.
+    missing_padding = len(image_base64) % 4
+    if missing_padding:
+        image_base64 += "=" * (4 - missing_padding)
+        logger.debug("Added %d padding chars to image_base64", 4 - missing_padding)
+    return image_base64
 
 
 class GeminiClassificationService:
@@ -83,42 +98,67 @@ class GeminiClassificationService:
                 "GEMINI_API_KEY is not set. Add it to your .env file."
             )
     
-        # Switch to Langchain Google SDK
-        self.model = ChatGoogleGenerativeAI(
-            model="gemini-2.5-flash",
-            google_api_key=settings.GEMINI_API_KEY
-        )
+        # Shared Langchain Google SDK client (see llm_clients)
+        self.model = get_llm("classification")
 
     async def classify_image(
         self,
-        image_base64: str,
+        image: Union[str, bytes, memoryview],
         user_location: Optional[str] = None,
+        mime_type: str = "image/jpeg",
     ) -> List[WasteClassificationItem]:
         """
         Step 1: Send an image to Gemini and get structured waste classification data.
 
         Args:
-            image_base64: The image encoded as a base64 string.
+            image: Raw image bytes (multipart uploads) or a base64 string (JSON requests).
+                Raw bytes are only base64-encoded when the model message is built.
             user_location: Optional location string to help with localized rules.
+            mime_type: Content type of the image, used in the data URI sent to the model.
 
         Returns:
             A list of WasteClassificationItem objects (one per detected item).
         """
-        logger.info("classify_image called — user_location=%r image_size_chars=%d", user_location, len(image_base64))
-
-        # Strip data URI prefix if present.
-        # Cameras/browsers sometimes send "data:image/jpeg;base64,/9j/4AAQ..."
-        # We only want the part after the comma.
-        if "," in image_base64[:100]:
-            image_base64 = image_base64.split(",", 1)[1]
-            logger.debug("Stripped data URI prefix from image_base64")
-
-        # Fix padding — base64 strings must be a multiple of 4 chars.
-        # If truncated, adding "=" padding fixes it.
-        missing_padding = len(image_base64) % 4
-        if missing_padding:
-            image_base64 += "=" * (4 - missing_padding)
-            logger.debug("Added %d padding chars to image_base64", 4 - missing_padding)
+        image_base64: Optional[str] = None
+        image_bytes: Optional[Union[bytes, memoryview]] = None
+        if isinstance(image, str):
+            image_base64 = normalize_base64(image)
+            logger.info("classify_image called — user_location=%r image_size_chars=%d", user_location, len(image_base64))
+        else:
+            image_bytes = image
+            logger.info("classify_image called — user_location=%r image_size_bytes=%d", user_location, len(image_bytes))
+
+        # Fingerprint off the event loop; re-shoots and retries of the same item
+        # are answered from the image cache.
+        fingerprint = None
+        region = location_key(user_location)
+        if settings.CACHE_ENABLED:
+            try:
+                if image_bytes is None:
+                    image_bytes = base64.b64decode(image_base64)
+                fingerprint = await asyncio.to_thread(fingerprint_image, image_bytes)
+            except (binascii.Error, ValueError, OSError, Image.DecompressionBombError) as e:
+                logger.warning("classify_image: could not fingerprint image, skipping cache — %s", e)
+            if fingerprint is not None:
+                cached = image_cache.get(fingerprint, region)
+                if cached is not None:
+                    logger.info("classify_image cache hit — sha256=%s items=%d", fingerprint.sha256[:12], len(cached))
+                    return [item.model_copy() for item in cached]
+
+        # Downscale/recompress before sending — a 12 MP phone photo costs far more
+        # upload time and tokens than classification needs. On failure send the original.
+        if settings.IMAGE_PREPROCESS_ENABLED:
+            try:
+                if image_bytes is None:
+                    image_bytes = base64.b64decode(image_base64)
+                prepared = await preprocess_image(image_bytes)
+                image_bytes, image_base64, mime_type = prepared.data, None, prepared.mime_type
+            except (binascii.Error, ValueError, OSError, Image.DecompressionBombError) as e:
+                logger.warning("classify_image: could not preprocess image, sending original — %s", e)
+
+        # Only now does the image get base64-encoded — the model client needs a data URI
+        if image_base64 is None:
+            image_base64 = base64.b64encode(image_bytes).decode("ascii")
 
         # Build the prompt (add location context if provided)
         prompt = CLASSIFICATION_PROMPT
@@ -133,21 +173,22 @@ class GeminiClassificationService:
             {"type": "text", "text": prompt},
             {
                 "type": "image_url",
-                "image_url": {"url": f"data:image/jpeg;base64,{image_base64}"},
+                "image_url": {"url": f"data:{mime_type};base64,{image_base64}"},
             },
         ])
 
         logger.debug("Sending image classification request to Gemini")
-        response = await self.model.ainvoke([message])
+        response = await gemini_scheduler.call(lambda: self.model.ainvoke([message]), name="classify_image")
         logger.debug("Gemini image classification raw response: %r", response.content[:500] if response.content else None)
 
-        items_data = parse_json_response(response.content)
-        items = [WasteClassificationItem(**item) for item in items_data]
+        items = parse_model_list(response.content, WasteClassificationItem)
         logger.info(
             "classify_image complete — %d item(s) found: %s",
             len(items),
             [{"item": i.item_name, "material": i.material_type, "search_query": i.search_query} for i in items],
         )
+        if fingerprint is not None and items:
+            image_cache.set(fingerprint, region, [item.model_copy() for item in items])
         return items
 
     async def classify_text(
@@ -167,6 +208,13 @@ class GeminiClassificationService:
         """
         logger.info("classify_text called — user_location=%r message=%r", user_location, message[:200])
 
+        cache_key = text_cache_key(message, user_location)
+        if settings.CACHE_ENABLED:
+            cached = await classification_cache.aget(cache_key)
+            if cached is not None:
+                logger.info("classify_text cache hit — key=%r items=%d", cache_key, len(cached))
+                return [item.model_copy() for item in cached]
+
         prompt = CLASSIFICATION_PROMPT
 
         if user_location:
@@ -179,15 +227,16 @@ class GeminiClassificationService:
 
         messages = [HumanMessage(content=prompt)]
         logger.debug("Sending text classification request to Gemini")
-        response = await self.model.ainvoke(messages)
+        response = await gemini_scheduler.call(lambda: self.model.ainvoke(messages), name="classify_text")
         logger.debug("Gemini text classification raw response: %r", response.content[:500] if response.content else None)
 
-        items_data = parse_json_response(response.content)
-        items = [WasteClassificationItem(**item) for item in items_data]
+        items = parse_model_list(response.content, WasteClassificationItem)
         logger.info(
             "classify_text complete — %d item(s) found: %s",
             len(items),
             [{"item": i.item_name, "material": i.material_type, "search_query": i.search_query} for i in items],
         )
+        if settings.CACHE_ENABLED and items:
+            await classification_cache.aset(cache_key, [item.model_copy() for item in items])
         return items
     
\ No newline at end of file
@@ -1,20 +1,44 @@
 """
 Google OAuth credential helpers shared across calendar and other routes
 that need to interact with Google APIs on behalf of a user.
+
+google_credentials keeps each user's Credentials in memory:
+- the DB is only read when the user isn't cached yet
+- google_token_expiry is honored; a token within GOOGLE_TOKEN_REFRESH_MARGIN_SECONDS
+  of expiry is refreshed in the background while the current one is still used,
+  an expired one is refreshed before returning
+- at most one refresh per user runs at a time (SingleFlight); concurrent
+  requests share it
+- the refreshed token is written back to the DB in a background task on its
+  own session, so no request waits on that commit
 """
+import asyncio
 import logging
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional, Set
 
 from fastapi import HTTPException
+from google.auth.exceptions import RefreshError
 from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
-from sqlalchemy.orm import Session
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.config import settings
+from app.database import new_async_session
 from app.models.user import User
+from app.services.cache import SingleFlight, TTLCache
 
 logger = logging.getLogger(__name__)
 
 
+def _naive_utc(moment: Optional[datetime]) -> Optional[datetime]:
+    """google-auth compares expiry against a naive UTC clock."""
+    if moment is None or moment.tzinfo is None:
+        return moment
+    return moment.astimezone(timezone.utc).replace(tzinfo=None)
+
+
 def build_google_credentials(db_user: User) -> Credentials:
     """Construct a Google Credentials object from stored token fields."""
     return Credentials(
@@ -23,28 +47,17 @@ def build_google_credentials(db_user: User) -> Credentials:
         token_uri="https://oauth2.googleapis.com/token",
         client_id=settings.GOOGLE_OAUTH_CLIENT_ID,
         client_secret=settings.GOOGLE_OAUTH_CLIENT_SECRET,
+        expiry=_naive_utc(db_user.google_token_expiry),
     )
 
 
-def refresh_credentials_if_needed(creds: Credentials, db_user: User, db: Session) -> Credentials:
-    """Refresh expired credentials and persist the new token back to the DB."""
-    if not creds.valid:
-        if creds.expired and creds.refresh_token:
-            creds.refresh(Request())
-            db_user.google_access_token = creds.token
-            db_user.google_token_expiry = creds.expiry
-            db.commit()
-        else:
-            raise HTTPException(status_code=401, detail="Google credential invalid or expired")
-    return creds
-
-
-def get_user_with_google_tokens(user: dict, db: Session) -> User:
+async def get_user_with_google_tokens(user: dict, db: AsyncSession) -> User:
     """
     Load the DB user and assert they have a Google refresh token.
     Raises 401 if the user is not found or has not connected Google Calendar.
     """
-    db_user = db.query(User).filter(User.id == user["sub"]).first()
+    result = await db.execute(select(User).where(User.id == user["sub"]))
+    db_user = result.scalars().first()
     if not db_user:
         raise HTTPException(
             status_code=401,
@@ -56,3 +69,113 @@ def get_user_with_google_tokens(user: dict, db: Session) -> User:
             detail="Google Calendar not connected. Please reconnect your Google account.",
         )
     return db_user
+
+
+class GoogleCredentialStore:
+    def __init__(self, max_users: int, ttl_seconds: float, refresh_margin_seconds: float):
+        self._creds: TTLCache[Credentials] = TTLCache("google_credentials", max_users, ttl_seconds=ttl_seconds)
+        self._refreshes: SingleFlight[Credentials] = SingleFlight("google_token_refresh")
+        self._background: Set["asyncio.Task[Any]"] = set()
+        self.refresh_margin_seconds = refresh_margin_seconds
+        self.refreshed = 0
+        self.background_refreshes = 0
+        self.refresh_errors = 0
+        self.persist_errors = 0
+
+    def _seconds_left(self, creds: Credentials) -> Optional[float]:
+        if not creds.token:
+            return 0.0
+        if creds.expiry is None:
+            return None  # unknown — use it until Google rejects it
+        return (creds.expiry - _naive_utc(datetime.now(timezone.utc))).total_seconds()
+
+    def _spawn(self, coro) -> None:
+        task = asyncio.create_task(coro)
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    async def _persist(self, user_id: str, token: str, expiry: Optional[datetime]) -> None:
+        try:
+            async with new_async_session() as db:
+                await db.execute(
+                    update(User)
+                    .where(User.id == user_id)
+                    .values(
+                        google_access_token=token,
+                        google_token_expiry=expiry.replace(tzinfo=timezone.utc) if expiry else None,
+                    )
+                )
+                await db.commit()
+        except Exception as e:
+            self.persist_errors += 1
+            logger.warning("Google token persist failed for user=%s — kept in memory only: %s", user_id, e)
+
+    async def _do_refresh(self, user_id: str, creds: Credentials) -> Credentials:
+        seconds_left = self._seconds_left(creds)
+        if seconds_left is not None and seconds_left >= self.refresh_margin_seconds:
+            return creds  # a refresh that just finished already took care of it
+        try:
+            await asyncio.to_thread(creds.refresh, Request())
+        except RefreshError as e:
+            # Refresh token revoked or expired — the user has to reconnect
+            self.refresh_errors += 1
+            self._creds.delete(user_id)
+            logger.warning("Google token refresh rejected for user=%s: %s", user_id, e)
+            raise HTTPException(status_code=401, detail="Google credential invalid or expired")
+        except Exception:
+            self.refresh_errors += 1
+            raise
+        self.refreshed += 1
+        logger.info("Google token refreshed — user=%s expiry=%s", user_id, creds.expiry)
+        self._spawn(self._persist(user_id, creds.token, creds.expiry))
+        return creds
+
+    async def _refresh(self, user_id: str, creds: Credentials) -> Credentials:
+        return await self._refreshes.run(user_id, lambda: self._do_refresh(user_id, creds))
+
+    async def _refresh_quietly(self, user_id: str, creds: Credentials) -> None:
+        try:
+            await self._refresh(user_id, creds)
+        except Exception as e:
+            # The current token is still valid; the next request past expiry retries in the foreground
+            logger.warning("Background Google token refresh failed for user=%s: %s", user_id, e)
+
+    async def get(self, user: dict, db: AsyncSession) -> Credentials:
+        """Valid credentials for the user, refreshed if needed. Raises 401 if Google isn't connected."""
+        user_id = str(user["sub"])
+        creds = self._creds.get(user_id)
+        if creds is None:
+            creds = build_google_credentials(await get_user_with_google_tokens(user, db))
+            self._creds.set(user_id, creds)
+
+        seconds_left = self._seconds_left(creds)
+        if seconds_left is not None and seconds_left <= 0:
+            if not creds.refresh_token:
+                self._creds.delete(user_id)
+                raise HTTPException(status_code=401, detail="Google credential invalid or expired")
+            return await self._refresh(user_id, creds)
+        if seconds_left is not None and seconds_left < self.refresh_margin_seconds:
+            self.background_refreshes += 1
+            self._spawn(self._refresh_quietly(user_id, creds))
+        return creds
+
+    def invalidate(self, user_id: str) -> None:
+        """Forget the cached credentials (e.g. the user just stored new tokens)."""
+        self._creds.delete(str(user_id))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "cache": self._creds.stats(),
+            "refreshes": self._refreshes.stats(),
+            "refreshed": self.refreshed,
+            "background_refreshes": self.background_refreshes,
+            "refresh_errors": self.refresh_errors,
+            "persist_errors": self.persist_errors,
+        }
+
+
+google_credentials = GoogleCredentialStore(
+    max_users=settings.GOOGLE_CREDENTIAL_CACHE_SIZE,
+    ttl_seconds=settings.GOOGLE_CREDENTIAL_CACHE_TTL_SECONDS,
+    refresh_margin_seconds=settings.GOOGLE_TOKEN_REFRESH_MARGIN_SECONDS,
+)
@@ -0,0 +1,127 @@
+"""
+Shared, pooled httpx clients — one per upstream service.
+
+Services call get_http_client("places") instead of opening their own
+httpx.AsyncClient, so TCP/TLS connections are kept alive and reused across
+requests. main.py's lifespan handler closes every client on shutdown.
+Pool limits, keep-alive, HTTP/2 and timeouts come from Settings.
+"""
+import logging
+from typing import Any, Dict
+
+import httpx
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Upstreams opened eagerly at startup; any other name is created on first use
+UPSTREAMS = ("places", "ipinfo", "supabase")
+
+
+class InstrumentedTransport(httpx.AsyncHTTPTransport):
+    """AsyncHTTPTransport that counts in-flight requests and requests that had to wait for a pooled connection."""
+
+    def __init__(self, max_connections: int, **kwargs: Any):
+        super().__init__(**kwargs)
+        self.max_connections = max_connections
+        self.requests_total = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.pool_waits = 0
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        self.requests_total += 1
+        if self.in_flight >= self.max_connections:
+            self.pool_waits += 1
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        try:
+            return await super().handle_async_request(request)
+        finally:
+            self.in_flight -= 1
+
+    def pool_stats(self) -> Dict[str, Any]:
+        pool = self._pool
+        connections = list(pool.connections)
+        idle = sum(1 for c in connections if c.is_idle())
+        # httpcore keeps queued requests in a private list — best effort only
+        queued = sum(1 for r in getattr(pool, "_requests", []) if r.is_queued())
+        return {
+            "open_connections": len(connections),
+            "idle_connections": idle,
+            "active_connections": len(connections) - idle,
+            "queued_requests": queued,
+            "in_flight": self.in_flight,
+            "peak_in_flight": self.peak_in_flight,
+            "requests_total": self.requests_total,
+            "pool_waits": self.pool_waits,
+            "max_connections": self.max_connections,
+        }
+
+
+def _http2_available() -> bool:
+    if not settings.HTTP2_ENABLED:
+        return False
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        logger.warning("HTTP2_ENABLED is set but the 'h2' package is not installed — using HTTP/1.1")
+        return False
+    return True
+
+
+class HttpClientRegistry:
+    """Creates each named client on first use and closes them all together."""
+
+    def __init__(self):
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+        self._transports: Dict[str, InstrumentedTransport] = {}
+
+    def get(self, name: str) -> httpx.AsyncClient:
+        client = self._clients.get(name)
+        if client is None or client.is_closed:
+            http2 = _http2_available()
+            transport = InstrumentedTransport(
+                max_connections=settings.HTTP_MAX_CONNECTIONS,
+                limits=httpx.Limits(
+                    max_connections=settings.HTTP_MAX_CONNECTIONS,
+                    max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+                    keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY_SECONDS,
+                ),
+                http2=http2,
+                retries=1,  # retry connection failures once (stale keep-alive sockets)
+            )
+            client = httpx.AsyncClient(
+                transport=transport,
+                timeout=httpx.Timeout(
+                    settings.HTTP_TIMEOUT_SECONDS,
+                    connect=settings.HTTP_CONNECT_TIMEOUT_SECONDS,
+                    pool=settings.HTTP_POOL_TIMEOUT_SECONDS,
+                ),
+            )
+            self._clients[name] = client
+            self._transports[name] = transport
+            logger.info("Created shared HTTP client %r (http2=%s)", name, http2)
+        return client
+
+    def open_all(self) -> None:
+        for name in UPSTREAMS:
+            self.get(name)
+
+    async def aclose(self) -> None:
+        for name, client in self._clients.items():
+            await client.aclose()
+            logger.info("Closed shared HTTP client %r", name)
+        self._clients.clear()
+        self._transports.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {name: transport.pool_stats() for name, transport in self._transports.items()}
+
+
+http_clients = HttpClientRegistry()
+
+
+def get_http_client(name: str) -> httpx.AsyncClient:
+    return http_clients.get(name)
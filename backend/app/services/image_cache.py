@@ -0,0 +1,184 @@
+"""
+Content-addressed cache for image classifications.
+
+Each image is decoded once and fingerprinted two ways:
+- sha256 of the raw bytes — exact re-uploads (timeouts, double taps)
+- 64-bit dHash of a tiny grayscale thumbnail — re-shoots of the same item
+
+Near-duplicate lookups use a multi-index hash table: the 64-bit hash is split
+into (max_distance + 1) chunks, and by the pigeonhole principle any hash within
+max_distance bits of the query must match it exactly in at least one chunk.
+Only those bucket candidates get a full Hamming comparison, so lookups stay
+fast with hundreds of thousands of entries.
+"""
+import hashlib
+import io
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Set, Tuple
+
+from PIL import Image, ImageOps
+
+from app.core.config import settings
+from app.schemas.classification import WasteClassificationItem
+from app.services.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+HASH_BITS = 64
+
+
+@dataclass(frozen=True)
+class ImageFingerprint:
+    sha256: str
+    dhash: int
+
+
+@dataclass
+class _Entry:
+    dhash: int
+    items: List[WasteClassificationItem]
+
+
+def dhash(image: Image.Image) -> int:
+    """64-bit difference hash: compare horizontally adjacent pixels of a 9x8 grayscale thumbnail."""
+    small = image.convert("L").resize((9, 8), Image.Resampling.BILINEAR)
+    pixels = list(small.getdata())
+    value = 0
+    for row in range(8):
+        offset = row * 9
+        for col in range(8):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+
+def fingerprint_image(image_bytes: bytes) -> ImageFingerprint:
+    """Hash the raw bytes and compute a perceptual hash. CPU-bound — run off the event loop."""
+    digest = hashlib.sha256(image_bytes).hexdigest()
+    with Image.open(io.BytesIO(image_bytes)) as image:
+        # JPEG draft mode decodes at a reduced scale — we only need a 9x8 thumbnail.
+        image.draft("L", (64, 64))
+        image = ImageOps.exif_transpose(image)
+        return ImageFingerprint(sha256=digest, dhash=dhash(image))
+
+
+class MultiIndexHashIndex:
+    """Hamming-distance index over 64-bit hashes using exact-match chunk buckets."""
+
+    def __init__(self, max_distance: int):
+        self.max_distance = max(0, min(max_distance, HASH_BITS - 1))
+        chunks = self.max_distance + 1
+        base, extra = divmod(HASH_BITS, chunks)
+        self._spans: List[Tuple[int, int]] = []
+        shift = 0
+        for i in range(chunks):
+            width = base + (1 if i < extra else 0)
+            self._spans.append((shift, (1 << width) - 1))
+            shift += width
+        self._buckets: List[Dict[int, Set[str]]] = [{} for _ in self._spans]
+
+    def _chunks(self, value: int) -> List[int]:
+        return [(value >> shift) & mask for shift, mask in self._spans]
+
+    def add(self, key: str, value: int) -> None:
+        for bucket, chunk in zip(self._buckets, self._chunks(value)):
+            bucket.setdefault(chunk, set()).add(key)
+
+    def remove(self, key: str, value: int) -> None:
+        for bucket, chunk in zip(self._buckets, self._chunks(value)):
+            keys = bucket.get(chunk)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del bucket[chunk]
+
+    def candidates(self, value: int) -> Set[str]:
+        found: Set[str] = set()
+        for bucket, chunk in zip(self._buckets, self._chunks(value)):
+            keys = bucket.get(chunk)
+            if keys:
+                found.update(keys)
+        return found
+
+
+class ImageClassificationCache:
+    """Exact + near-duplicate lookup of previous image classifications, scoped by region."""
+
+    def __init__(self, max_entries: int, ttl_seconds: float, max_distance: int):
+        self.max_distance = max_distance
+        self._index = MultiIndexHashIndex(max_distance)
+        self._lock = threading.Lock()
+        self._entries: TTLCache[_Entry] = TTLCache(
+            "image_classification", max_entries, ttl_seconds, on_evict=self._unindex,
+        )
+        self.exact_hits = 0
+        self.near_hits = 0
+        self.misses = 0
+
+    def _unindex(self, key: str, entry: _Entry) -> None:
+        with self._lock:
+            self._index.remove(key, entry.dhash)
+
+    def get(self, fp: ImageFingerprint, region: str) -> Optional[List[WasteClassificationItem]]:
+        entry = self._entries.peek(f"{region}|{fp.sha256}", touch=True)
+        if entry is not None:
+            self.exact_hits += 1
+            return entry.items
+
+        if self.max_distance > 0:
+            with self._lock:
+                candidates = self._index.candidates(fp.dhash)
+            best: Optional[Tuple[int, str, _Entry]] = None
+            for key in candidates:
+                if not key.startswith(f"{region}|"):
+                    continue
+                entry = self._entries.peek(key)
+                if entry is None:
+                    continue
+                distance = (entry.dhash ^ fp.dhash).bit_count()
+                if distance <= self.max_distance and (best is None or distance < best[0]):
+                    best = (distance, key, entry)
+            if best is not None:
+                distance, key, entry = best
+                self._entries.peek(key, touch=True)
+                self.near_hits += 1
+                logger.debug("Image cache near-duplicate hit — hamming=%d", distance)
+                return entry.items
+
+        self.misses += 1
+        return None
+
+    def set(self, fp: ImageFingerprint, region: str, items: List[WasteClassificationItem]) -> None:
+        key = f"{region}|{fp.sha256}"
+        previous = self._entries.peek(key)
+        if previous is not None:
+            self._unindex(key, previous)
+        entry = _Entry(dhash=fp.dhash, items=items)
+        self._entries.set(key, entry)
+        # set() stores nothing when the cache is disabled (size or TTL 0) — index only what was stored
+        if self._entries.peek(key) is entry:
+            with self._lock:
+                self._index.add(key, fp.dhash)
+
+    def stats(self) -> Dict[str, object]:
+        hits = self.exact_hits + self.near_hits
+        lookups = hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_entries": self._entries.max_entries,
+            "hits": hits,
+            "exact_hits": self.exact_hits,
+            "near_duplicate_hits": self.near_hits,
+            "misses": self.misses,
+            "evictions": self._entries.evictions,
+            "hit_ratio": round(hits / lookups, 4) if lookups else 0.0,
+            "max_hamming_distance": self.max_distance,
+        }
+
+
+image_cache = ImageClassificationCache(
+    max_entries=settings.IMAGE_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.IMAGE_CACHE_TTL_SECONDS,
+    max_distance=settings.IMAGE_CACHE_MAX_HAMMING,
+)
@@ -0,0 +1,172 @@
+"""
+Downscale and recompress photos before they are sent to Gemini.
+
+Phones upload 4–12 MP images, but classifying a waste item needs far less.
+prepare_image():
+- sends a JPEG/PNG/WebP that already fits IMAGE_MAX_EDGE and IMAGE_MAX_BYTES
+  unchanged; if it carries EXIF/XMP and is an upright JPEG, those segments are
+  cut out of the file without re-encoding
+- otherwise decodes JPEGs in draft mode (libjpeg DCT scaling — a 12 MP photo is decoded
+  at 1/2, 1/4 or 1/8 size instead of full resolution)
+- applies the EXIF orientation, then drops EXIF/ICC/GPS metadata
+- resizes so the longest edge is at most IMAGE_MAX_EDGE
+- re-encodes as JPEG at IMAGE_JPEG_QUALITY, stepping quality (then size) down
+  until the result fits IMAGE_MAX_BYTES and is no larger than the upload
+
+The work is CPU-bound, so it runs on a small dedicated thread pool (Pillow
+releases the GIL while decoding, resizing and encoding).
+"""
+import asyncio
+import io
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Optional, Union
+
+from PIL import Image, ImageOps
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+QUALITY_STEP = 10
+SHRINK_FACTOR = 0.75
+MIN_EDGE = 256
+
+PASSTHROUGH_FORMATS = {"JPEG", "PNG", "WEBP"}  # sent as-is when small enough; Gemini accepts all three
+EXIF_ORIENTATION = 0x0112
+# Dropped when stripping a JPEG in place: APP1 (EXIF, XMP), APP13 (IPTC), COM
+STRIPPED_JPEG_MARKERS = {0xE1, 0xED, 0xFE}
+
+_executor = ThreadPoolExecutor(
+    max_workers=settings.IMAGE_PREPROCESS_WORKERS,
+    thread_name_prefix="image-preprocess",
+)
+
+
+@dataclass(frozen=True)
+class PreparedImage:
+    data: bytes
+    mime_type: str
+    width: int
+    height: int
+    original_bytes: int
+    quality: Optional[int]  # None when the image wasn't re-encoded
+
+
+def _to_rgb(image: Image.Image) -> Image.Image:
+    """Flatten transparency onto white — JPEG has no alpha channel."""
+    if image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info):
+        image = image.convert("RGBA")
+        background = Image.new("RGB", image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel("A"))
+        return background
+    if image.mode != "RGB":
+        return image.convert("RGB")
+    return image
+
+
+def _has_metadata(image: Image.Image) -> bool:
+    return bool(image.getexif()) or "xmp" in image.info or "XML:com.adobe.xmp" in image.info
+
+
+def _strip_jpeg_metadata(data: bytes) -> Optional[bytes]:
+    """Copy a JPEG without its metadata segments, leaving the image data untouched. None if it can't be parsed."""
+    if data[:2] != b"\xff\xd8":
+        return None
+    out = bytearray(data[:2])
+    pos = 2
+    while pos + 4 <= len(data):
+        if data[pos] != 0xFF:
+            return None
+        marker = data[pos + 1]
+        if marker == 0xFF:
+            pos += 1  # fill byte
+            continue
+        if marker == 0xDA:
+            out += data[pos:]  # start of scan — everything after is image data
+            return bytes(out)
+        if marker == 0x01 or 0xD0 <= marker <= 0xD7:
+            out += data[pos:pos + 2]  # standalone marker, no length
+            pos += 2
+            continue
+        end = pos + 2 + int.from_bytes(data[pos + 2:pos + 4], "big")
+        if end <= pos + 3 or end > len(data):
+            return None
+        if marker not in STRIPPED_JPEG_MARKERS:
+            out += data[pos:end]
+        pos = end
+    return None
+
+
+def _encode(image: Image.Image, quality: int) -> bytes:
+    out = io.BytesIO()
+    # No exif=/icc_profile= arguments, so the re-encoded file carries no metadata
+    image.save(out, format="JPEG", quality=quality, optimize=True)
+    return out.getvalue()
+
+
+def prepare_image(image_bytes: Union[bytes, memoryview]) -> PreparedImage:
+    """Downscale, orient, strip and recompress one image. CPU-bound — run off the event loop."""
+    max_edge = settings.IMAGE_MAX_EDGE
+    original_bytes = len(image_bytes)
+    with Image.open(io.BytesIO(image_bytes)) as source:
+        mime_type = Image.MIME.get(source.format or "", "")
+        width, height = source.size
+        has_metadata = _has_metadata(source)
+        reusable = source.format in PASSTHROUGH_FORMATS and not has_metadata
+        fits = max(width, height) <= max_edge and original_bytes <= settings.IMAGE_MAX_BYTES
+        if fits and reusable:
+            return PreparedImage(bytes(image_bytes), mime_type, width, height, original_bytes, quality=None)
+        if fits and source.format == "JPEG" and source.getexif().get(EXIF_ORIENTATION, 1) == 1:
+            stripped = _strip_jpeg_metadata(bytes(image_bytes))
+            if stripped is not None:
+                return PreparedImage(stripped, mime_type, width, height, original_bytes, quality=None)
+        # Only JPEGs support draft mode; it decodes at the smallest DCT scale still >= the requested size
+        source.draft("RGB", (max_edge, max_edge))
+        image = ImageOps.exif_transpose(source)
+        image = _to_rgb(image)
+    image.thumbnail((max_edge, max_edge), Image.Resampling.LANCZOS)
+
+    quality = settings.IMAGE_JPEG_QUALITY
+    target = min(settings.IMAGE_MAX_BYTES, original_bytes)
+    data = _encode(image, quality)
+    while len(data) > target:
+        if quality - QUALITY_STEP >= settings.IMAGE_MIN_JPEG_QUALITY:
+            quality -= QUALITY_STEP
+        elif max(image.size) > MIN_EDGE:
+            width, height = image.size
+            image = image.resize(
+                (max(1, int(width * SHRINK_FACTOR)), max(1, int(height * SHRINK_FACTOR))),
+                Image.Resampling.LANCZOS,
+            )
+        else:
+            break  # as small as we're willing to go
+        data = _encode(image, quality)
+
+    if len(data) > original_bytes and reusable:
+        return PreparedImage(bytes(image_bytes), mime_type, width, height, original_bytes, quality=None)
+    return PreparedImage(
+        data=data,
+        mime_type="image/jpeg",
+        width=image.width,
+        height=image.height,
+        original_bytes=original_bytes,
+        quality=quality,
+    )
+
+
+async def preprocess_image(image_bytes: Union[bytes, memoryview]) -> PreparedImage:
+    """Run prepare_image on the preprocessing thread pool and log the size reduction."""
+    start = time.perf_counter()
+    loop = asyncio.get_running_loop()
+    prepared = await loop.run_in_executor(_executor, prepare_image, image_bytes)
+    logger.info(
+        "Image preprocessed — bytes_before=%d bytes_after=%d (%.0f%%) size=%dx%d quality=%s elapsed_ms=%.1f",
+        prepared.original_bytes, len(prepared.data),
+        100 * len(prepared.data) / prepared.original_bytes if prepared.original_bytes else 0,
+        prepared.width, prepared.height, "original" if prepared.quality is None else prepared.quality,
+        (time.perf_counter() - start) * 1000,
+    )
+    return prepared
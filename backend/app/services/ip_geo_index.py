@@ -0,0 +1,158 @@
+"""
+Offline IPv4 → location index, memory-mapped so every worker shares one copy.
+
+The on-disk format is built once from a CSV of IP ranges
+(start_ip,end_ip,city,region,postal,country — ipinfo/IP2Location "lite" style):
+
+    header        8s magic, uint32 range_count, uint32 label_count
+    starts        uint32[range_count]   sorted range starts
+    ends          uint32[range_count]   inclusive range ends
+    label_ids     uint32[range_count]   index into the label table
+    label_offsets uint32[label_count+1] byte offsets into the blob
+    blob          UTF-8 labels, e.g. "Marietta, GA 30062, US"
+
+Lookups are a binary search over the mmap'd starts array — no parsing, no
+per-process copy, sub-millisecond.
+
+Build an index:
+    python -m app.services.ip_geo_index ranges.csv ip_geo.bin
+"""
+import bisect
+import csv
+import ipaddress
+import logging
+import mmap
+import struct
+import sys
+from array import array
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"IPGEOv1\0"
+HEADER = struct.Struct("<8sII")
+MAX_IPV4 = 2**32 - 1
+
+
+def format_location(
+    city: Optional[str],
+    region: Optional[str],
+    postal: Optional[str] = None,
+    country: Optional[str] = None,
+) -> Optional[str]:
+    """Format location parts the way the rest of the pipeline expects: "City, Region ZIP, Country"."""
+    if not (city and region):
+        return None
+    location = f"{city}, {region}"
+    if postal:
+        location += f" {postal}"
+    if country:
+        location += f", {country}"
+    return location
+
+
+def _ip_to_int(value: str) -> int:
+    value = value.strip()
+    if value.isdigit():
+        return int(value)
+    return int(ipaddress.IPv4Address(value))
+
+
+def build_index(csv_path: str, out_path: str) -> int:
+    """Convert a CSV of IPv4 ranges into the binary index format. Returns the number of ranges."""
+    if sys.byteorder != "little" or array("I").itemsize != 4:
+        raise RuntimeError("IP geo index requires a little-endian host with 32-bit unsigned ints")
+    ranges: List[Tuple[int, int, str]] = []
+    with open(csv_path, newline="", encoding="utf-8") as f:
+        for row in csv.reader(f):
+            if len(row) < 4:
+                continue
+            try:
+                start, end = _ip_to_int(row[0]), _ip_to_int(row[1])
+            except ValueError:
+                continue  # header row or dotted IPv6 range
+            if start > MAX_IPV4 or end > MAX_IPV4:
+                continue  # IPv6 range written as decimal — won't fit array("I")
+            padded = (row[2:] + ["", "", "", ""])[:4]
+            label = format_location(*(part.strip() or None for part in padded))
+            if label:
+                ranges.append((start, end, label))
+    ranges.sort()
+
+    labels: Dict[str, int] = {}
+    label_ids = [labels.setdefault(label, len(labels)) for _, _, label in ranges]
+    blob = bytearray()
+    offsets = [0]
+    for label in labels:
+        blob += label.encode("utf-8")
+        offsets.append(len(blob))
+
+    count = len(ranges)
+    with open(out_path, "wb") as out:
+        out.write(HEADER.pack(MAGIC, count, len(labels)))
+        for values in ([r[0] for r in ranges], [r[1] for r in ranges], label_ids, offsets):
+            out.write(array("I", values).tobytes())
+        out.write(blob)
+    logger.info("Built IP geo index %s — %d ranges, %d distinct locations", out_path, count, len(labels))
+    return count
+
+
+class IpGeoIndex:
+    """Read-only view over a memory-mapped index file."""
+
+    def __init__(self, path: str):
+        if sys.byteorder != "little":
+            raise RuntimeError("IP geo index requires a little-endian host")
+        self.path = path
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, count, label_count = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not an IP geo index")
+
+        view = memoryview(self._mmap)
+        pos = HEADER.size
+        array_bytes = count * 4
+        self.starts = view[pos:pos + array_bytes].cast("I")
+        pos += array_bytes
+        self.ends = view[pos:pos + array_bytes].cast("I")
+        pos += array_bytes
+        self.label_ids = view[pos:pos + array_bytes].cast("I")
+        pos += array_bytes
+        self.label_offsets = view[pos:pos + (label_count + 1) * 4].cast("I")
+        pos += (label_count + 1) * 4
+        self._blob = view[pos:]
+        self.count = count
+
+    def lookup(self, ip: str) -> Optional[str]:
+        try:
+            value = int(ipaddress.IPv4Address(ip))
+        except ValueError:
+            return None  # IPv6 or garbage — not covered by this index
+        i = bisect.bisect_right(self.starts, value) - 1
+        if i < 0 or self.ends[i] < value:
+            return None
+        label_id = self.label_ids[i]
+        start, end = self.label_offsets[label_id], self.label_offsets[label_id + 1]
+        return bytes(self._blob[start:end]).decode("utf-8")
+
+
+def load_index(path: Optional[str]) -> Optional[IpGeoIndex]:
+    """Open the index at `path`, or return None (remote lookups only) if unset or unreadable."""
+    if not path:
+        return None
+    try:
+        index = IpGeoIndex(path)
+    except (OSError, ValueError, RuntimeError) as e:
+        logger.warning("IP geo index %r unavailable — falling back to remote lookups: %s", path, e)
+        return None
+    logger.info("Loaded IP geo index %s — %d ranges", path, index.count)
+    return index
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print("usage: python -m app.services.ip_geo_index <ranges.csv> <out.bin>")
+        sys.exit(1)
+    logging.basicConfig(level=logging.INFO)
+    build_index(sys.argv[1], sys.argv[2])
@@ -0,0 +1,97 @@
+"""
+Process-wide registry of Gemini chat clients.
+
+Use sites ask for a client by name — get_llm("classification"), "disposal",
+"schedule" — instead of constructing ChatGoogleGenerativeAI themselves.
+One base client (GEMINI_MODEL) is built on first use; a site whose
+GEMINI_SITE_PARAMS entry overrides the model or sampling parameters gets a
+model_copy() of it, which keeps the same underlying google-genai Client and
+therefore the same connection pool.
+
+    GEMINI_SITE_PARAMS='{"schedule": {"model": "gemini-2.5-flash-lite", "temperature": 0.2}}'
+
+main.py's lifespan optionally warms the connection (LLM_WARMUP_ON_STARTUP) so
+the first request after a deploy doesn't pay for DNS + TLS, and closes the
+client on shutdown.
+"""
+import asyncio
+import logging
+from typing import Any, Dict, Optional
+
+from langchain_google_genai import ChatGoogleGenerativeAI
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+USE_SITES = ("classification", "disposal", "schedule")
+WARMUP_TIMEOUT_SECONDS = 5.0
+
+
+class LLMClientRegistry:
+    def __init__(self):
+        self._base: Optional[ChatGoogleGenerativeAI] = None
+        self._clients: Dict[str, ChatGoogleGenerativeAI] = {}
+
+    def site_params(self, site: str) -> Dict[str, Any]:
+        """Overrides for one use site, limited to fields ChatGoogleGenerativeAI actually has."""
+        params = dict(settings.GEMINI_SITE_PARAMS.get(site, {}))
+        unknown = [k for k in params if k not in ChatGoogleGenerativeAI.model_fields]
+        for key in unknown:
+            logger.warning("GEMINI_SITE_PARAMS[%r]: ignoring unknown parameter %r", site, key)
+            params.pop(key)
+        return params
+
+    def _base_client(self) -> ChatGoogleGenerativeAI:
+        if self._base is None:
+            # max_retries=1: retries/backoff are handled by gemini_scheduler
+            self._base = ChatGoogleGenerativeAI(
+                model=settings.GEMINI_MODEL,
+                google_api_key=settings.GEMINI_API_KEY,
+                max_retries=1,
+            )
+            logger.info("Created shared Gemini client — model=%s", settings.GEMINI_MODEL)
+        return self._base
+
+    def get(self, site: str) -> ChatGoogleGenerativeAI:
+        client = self._clients.get(site)
+        if client is None:
+            base = self._base_client()
+            params = self.site_params(site)
+            # model_copy keeps the base's google-genai Client, so every site shares one transport
+            client = base.model_copy(update=params) if params else base
+            self._clients[site] = client
+            logger.info("Gemini client for %r — model=%s overrides=%s", site, client.model, params or None)
+        return client
+
+    async def warm_up(self) -> None:
+        """Open the connection to the Gemini API ahead of the first request (metadata call, no tokens)."""
+        for site in USE_SITES:
+            self.get(site)
+        models = {client.model for client in self._clients.values()}
+        base = self._base_client()
+        for model in models:
+            try:
+                await asyncio.wait_for(base.async_client.models.get(model=model), timeout=WARMUP_TIMEOUT_SECONDS)
+                logger.info("Gemini connection warmed — model=%s", model)
+            except Exception as e:
+                logger.warning("Gemini warm-up failed for model=%s — first request will connect cold: %s: %s", model, type(e).__name__, e)
+
+    async def aclose(self) -> None:
+        if self._base is not None:
+            try:
+                await self._base.aclose()
+            except Exception as e:
+                logger.warning("Closing Gemini client failed: %s", e)
+        self._base = None
+        self._clients.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {site: {"model": client.model} for site, client in self._clients.items()}
+
+
+llm_clients = LLMClientRegistry()
+
+
+def get_llm(site: str) -> ChatGoogleGenerativeAI:
+    return llm_clients.get(site)
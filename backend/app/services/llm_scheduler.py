@@ -0,0 +1,279 @@
+"""
+Process-wide scheduler for Gemini calls.
+
+Every model call (classification, the disposal agent, schedule suggestions)
+goes through gemini_scheduler.call(), which:
+- caps how many calls are in flight at once, across all call sites
+- adapts that cap AIMD-style: +1 slot per window of successful calls, halved on
+  a 429 (and trimmed when latency climbs past GEMINI_LATENCY_TARGET_SECONDS),
+  never more than once per cool-down so one burst of errors counts once
+- retries 429 / 5xx / timeouts with full-jitter exponential backoff
+- hands free slots to waiters by priority class, so an interactive classify
+  jumps ahead of batch entries and background work
+
+Priority defaults to the `llm_priority` context variable, so a route can mark a
+whole request (and every model call under it) with one llm_priority.set().
+
+The langchain clients are built with max_retries=1 so their own retry loop
+doesn't hide 429s from the scheduler.
+"""
+import asyncio
+import heapq
+import itertools
+import logging
+import random
+import time
+from contextvars import ContextVar
+from enum import IntEnum
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple, TypeVar
+
+import httpx
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+DECREASE_FACTOR = 0.5          # on 429
+LATENCY_DECREASE_FACTOR = 0.9  # on a call slower than the latency target
+COOLDOWN_SECONDS = 2.0
+
+
+class Priority(IntEnum):
+    INTERACTIVE = 0  # a user waiting on /classify
+    BATCH = 1        # entries of /classify/batch
+    BACKGROUND = 2   # schedule suggestions and anything else that can wait
+
+
+llm_priority: ContextVar[Priority] = ContextVar("llm_priority", default=Priority.INTERACTIVE)
+
+
+class ModelOverloadedError(Exception):
+    """Gemini kept rate-limiting us (or the queue was too long) — callers should answer 503."""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = max(1.0, retry_after)
+
+
+def status_code_of(exc: BaseException) -> Optional[int]:
+    """Find an HTTP status on the exception or anything it was raised from."""
+    seen = set()
+    while exc is not None and id(exc) not in seen:
+        seen.add(id(exc))
+        for attr in ("code", "status_code"):
+            value = getattr(exc, attr, None)
+            if isinstance(value, int) and 100 <= value < 600:
+                return value
+        response = getattr(exc, "response", None)
+        value = getattr(response, "status_code", None)
+        if isinstance(value, int):
+            return value
+        exc = exc.__cause__ or exc.__context__
+    return None
+
+
+def is_rate_limited(exc: BaseException) -> bool:
+    return status_code_of(exc) == 429 or "RESOURCE_EXHAUSTED" in str(exc)
+
+
+def is_retryable(exc: BaseException) -> bool:
+    if isinstance(exc, (asyncio.TimeoutError, httpx.TimeoutException, httpx.TransportError)):
+        return True
+    code = status_code_of(exc)
+    return is_rate_limited(exc) or (code is not None and code >= 500)
+
+
+class GeminiScheduler:
+    def __init__(
+        self,
+        max_concurrency: int,
+        min_concurrency: int,
+        initial_concurrency: int,
+        latency_target_seconds: float,
+        max_retries: int,
+        retry_base_seconds: float,
+        retry_max_seconds: float,
+        queue_timeout_seconds: float,
+    ):
+        self.max_concurrency = max(1, max_concurrency)
+        self.min_concurrency = max(1, min(min_concurrency, self.max_concurrency))
+        self.limit = float(min(max(initial_concurrency, self.min_concurrency), self.max_concurrency))
+        self.latency_target_seconds = latency_target_seconds
+        self.max_retries = max_retries
+        self.retry_base_seconds = retry_base_seconds
+        self.retry_max_seconds = retry_max_seconds
+        self.queue_timeout_seconds = queue_timeout_seconds
+
+        self.active = 0
+        self._waiters: List[Tuple[int, int, "asyncio.Future[None]"]] = []
+        self._seq = itertools.count()
+        self._last_decrease = 0.0
+
+        self.calls = 0
+        self.retries = 0
+        self.throttled = 0
+        self.failures = 0
+        self.queue_timeouts = 0
+        self.waits = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self.peak_queue_depth = 0
+
+    # ── Slots ───────────────────────────────────────────────────────────────
+
+    def _dispatch(self) -> None:
+        while self._waiters and self.active < int(self.limit):
+            _, _, future = heapq.heappop(self._waiters)
+            if future.done():
+                continue  # waiter timed out or was cancelled
+            self.active += 1
+            future.set_result(None)
+
+    async def _acquire(self, priority: Priority) -> float:
+        if self.active < int(self.limit) and not self._waiters:
+            self.active += 1
+            return 0.0
+        start = time.monotonic()
+        future: "asyncio.Future[None]" = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (int(priority), next(self._seq), future))
+        self.peak_queue_depth = max(self.peak_queue_depth, self.queue_depth())
+        try:
+            await asyncio.wait_for(asyncio.shield(future), timeout=self.queue_timeout_seconds)
+        except asyncio.TimeoutError:
+            if future.done() and not future.cancelled():
+                self._release()  # the slot was granted just as we gave up
+            future.cancel()
+            self.queue_timeouts += 1
+            raise ModelOverloadedError(
+                f"Gemini queue wait exceeded {self.queue_timeout_seconds:.0f}s", retry_after=self.retry_max_seconds,
+            )
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self._release()
+            future.cancel()
+            raise
+        waited = time.monotonic() - start
+        self.waits += 1
+        self.wait_seconds_total += waited
+        self.wait_seconds_max = max(self.wait_seconds_max, waited)
+        return waited
+
+    def _release(self) -> None:
+        self.active -= 1
+        self._dispatch()
+
+    # ── AIMD ────────────────────────────────────────────────────────────────
+
+    def _decrease(self, factor: float, reason: str) -> None:
+        now = time.monotonic()
+        if now - self._last_decrease < COOLDOWN_SECONDS:
+            return
+        self._last_decrease = now
+        old = self.limit
+        self.limit = max(float(self.min_concurrency), self.limit * factor)
+        logger.warning("Gemini scheduler — %s, concurrency limit %.1f → %.1f", reason, old, self.limit)
+
+    def _on_success(self, latency: float) -> None:
+        if latency > self.latency_target_seconds:
+            self._decrease(LATENCY_DECREASE_FACTOR, f"slow call ({latency:.1f}s)")
+            return
+        # Additive increase: about +1 slot per `limit` successful calls
+        self.limit = min(float(self.max_concurrency), self.limit + 1.0 / self.limit)
+        self._dispatch()
+
+    def _backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.retry_max_seconds, self.retry_base_seconds * 2 ** attempt))
+
+    # ── Public API ──────────────────────────────────────────────────────────
+
+    async def call(
+        self,
+        fn: Callable[[], Awaitable[T]],
+        name: str = "gemini",
+        priority: Optional[Priority] = None,
+        max_retries: Optional[int] = None,
+    ) -> T:
+        """Run fn() (one model call) under the scheduler, retrying transient failures (max_retries overrides the default)."""
+        priority = llm_priority.get() if priority is None else priority
+        max_retries = self.max_retries if max_retries is None else max_retries
+        attempt = 0
+        while True:
+            waited = await self._acquire(priority)
+            self.calls += 1
+            start = time.monotonic()
+            try:
+                result = await fn()
+            except Exception as e:
+                self._release()
+                rate_limited = is_rate_limited(e)
+                if rate_limited:
+                    self.throttled += 1
+                    self._decrease(DECREASE_FACTOR, "429 from Gemini")
+                if not is_retryable(e):
+                    self.failures += 1
+                    raise
+                if attempt >= max_retries:
+                    self.failures += 1
+                    if rate_limited:
+                        raise ModelOverloadedError(
+                            f"Gemini rate limit persisted after {attempt + 1} attempts", retry_after=self.retry_max_seconds,
+                        ) from e
+                    raise
+                delay = self._backoff(attempt)
+                attempt += 1
+                self.retries += 1
+                logger.warning(
+                    "Gemini call %s failed (%s) — retry %d/%d in %.2fs",
+                    name, type(e).__name__, attempt, max_retries, delay,
+                )
+                await asyncio.sleep(delay)
+                continue
+            except BaseException:
+                self._release()
+                raise
+            latency = time.monotonic() - start
+            self._on_success(latency)
+            self._release()
+            logger.debug(
+                "Gemini call %s — priority=%s waited_ms=%.1f latency_ms=%.1f limit=%.1f",
+                name, priority.name, waited * 1000, latency * 1000, self.limit,
+            )
+            return result
+
+    def queue_depth(self) -> int:
+        return sum(1 for _, _, f in self._waiters if not f.done())
+
+    def stats(self) -> Dict[str, Any]:
+        by_priority = {p.name.lower(): 0 for p in Priority}
+        for priority, _, future in self._waiters:
+            if not future.done():
+                by_priority[Priority(priority).name.lower()] += 1
+        return {
+            "concurrency_limit": round(self.limit, 2),
+            "active": self.active,
+            "queue_depth": sum(by_priority.values()),
+            "queue_depth_by_priority": by_priority,
+            "peak_queue_depth": self.peak_queue_depth,
+            "avg_wait_ms": round(self.wait_seconds_total / self.waits * 1000, 1) if self.waits else 0.0,
+            "max_wait_ms": round(self.wait_seconds_max * 1000, 1),
+            "queued_calls": self.waits,
+            "calls": self.calls,
+            "retries": self.retries,
+            "throttled": self.throttled,
+            "failures": self.failures,
+            "queue_timeouts": self.queue_timeouts,
+        }
+
+
+gemini_scheduler = GeminiScheduler(
+    max_concurrency=settings.GEMINI_MAX_CONCURRENCY,
+    min_concurrency=settings.GEMINI_MIN_CONCURRENCY,
+    initial_concurrency=settings.GEMINI_INITIAL_CONCURRENCY,
+    latency_target_seconds=settings.GEMINI_LATENCY_TARGET_SECONDS,
+    max_retries=settings.GEMINI_MAX_RETRIES,
+    retry_base_seconds=settings.GEMINI_RETRY_BASE_SECONDS,
+    retry_max_seconds=settings.GEMINI_RETRY_MAX_SECONDS,
+    queue_timeout_seconds=settings.GEMINI_QUEUE_TIMEOUT_SECONDS,
+)
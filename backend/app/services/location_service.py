@@ -1,13 +1,25 @@
 
 import ipaddress
 import logging
-import httpx
 from typing import Optional
 
+from app.core.config import settings
+from app.services.cache import TTLCache
+from app.services.http_clients import get_http_client
+from app.services.ip_geo_index import format_location, load_index
+
 logger = logging.getLogger(__name__)
 
 DEV_FALLBACK_LOCATION = "Marietta, GA 30062, US"
 
+# Optional offline index (see ip_geo_index.py); ipinfo.io is only used for misses
+ip_index = load_index(settings.IP_GEO_DB_PATH)
+
+# Recently resolved IPs — a client usually sends several requests in a row
+ip_location_cache: TTLCache[str] = TTLCache(
+    "ip_location", settings.IP_GEO_CACHE_SIZE, settings.IP_GEO_CACHE_TTL_SECONDS,
+)
+
 def is_private_ip(ip: str) -> bool:
     try:
         return ipaddress.ip_address(ip).is_private
@@ -21,27 +33,34 @@ async def get_location_from_ip(ip: str) -> Optional[str]:
         logger.info("IP %s is private — using dev fallback location: %s", ip, DEV_FALLBACK_LOCATION)
         return DEV_FALLBACK_LOCATION
 
+    cached = ip_location_cache.get(ip)
+    if cached is not None:
+        logger.info("Resolved IP %s → location: %s (cached)", ip, cached)
+        return cached
+
+    if ip_index is not None:
+        location = ip_index.lookup(ip)
+        if location:
+            logger.info("Resolved IP %s → location: %s (offline index)", ip, location)
+            ip_location_cache.set(ip, location)
+            return location
+        logger.debug("IP %s not in offline index — falling back to ipinfo.io", ip)
+
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(f"https://ipinfo.io/{ip}/json", timeout=3.0)
-            data = response.json()
-            logger.debug("ipinfo.io raw response for %s: %s", ip, data)
-
-            city = data.get("city")
-            region = data.get("region")
-            postal = data.get("postal")
-            country = data.get("country")
-
-            if city and region:
-                location = f"{city}, {region}"
-                if postal:
-                    location += f" {postal}"
-                if country:
-                    location += f", {country}"
-                logger.info("Resolved IP %s → location: %s", ip, location)
-                return location
-            else:
-                logger.warning("ipinfo.io response for IP %s missing city/region — city=%r region=%r", ip, city, region)
+        response = await get_http_client("ipinfo").get(f"https://ipinfo.io/{ip}/json", timeout=3.0)
+        data = response.json()
+        logger.debug("ipinfo.io raw response for %s: %s", ip, data)
+
+        city = data.get("city")
+        region = data.get("region")
+        location = format_location(city, region, data.get("postal"), data.get("country"))
+
+        if location:
+            logger.info("Resolved IP %s → location: %s", ip, location)
+            ip_location_cache.set(ip, location)
+            return location
+        else:
+            logger.warning("ipinfo.io response for IP %s missing city/region — city=%r region=%r", ip, city, region)
     except Exception as e:
         logger.error("Location lookup failed for IP %s: %s", ip, e, exc_info=True)
 
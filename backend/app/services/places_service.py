@@ -4,10 +4,10 @@ import asyncio
 import logging
 from typing import List, Optional
 
-import httpx
-
 from app.core.config import settings
 from app.schemas.classification import DisposalFacility
+from app.services.facility_store import facility_store
+from app.services.http_clients import get_http_client
 
 logger = logging.getLogger(__name__)
 
@@ -21,6 +21,7 @@ async def enrich_facility(
 ) -> DisposalFacility:
     """Look up a facility via Google Places Text Search (New) API and return enriched data.
 
+    Answers from the facility store first (including cached "no match" results).
     If the API key is missing or the request fails, returns an unenriched facility
     with just the name and address from Gemini.
     """
@@ -28,6 +29,14 @@ async def enrich_facility(
         logger.warning("GOOGLE_PLACES_API_KEY not set — skipping Places enrichment for %r", name)
         return DisposalFacility(name=name, address=address)
 
+    if settings.CACHE_ENABLED:
+        cached = await facility_store.get(name, address)
+        if cached is not None:
+            logger.info("Facility store hit for %r (found=%s)", name, cached.found)
+            if cached.facility is None:
+                return DisposalFacility(name=name, address=address)
+            return cached.facility.model_copy()
+
     query = f"{name} {address}"
     if user_location:
         query += f" near {user_location}"
@@ -46,14 +55,15 @@ async def enrich_facility(
     body = {"textQuery": query, "maxResultCount": 1}
 
     try:
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            resp = await client.post(PLACES_TEXT_SEARCH_URL, headers=headers, json=body)
-            resp.raise_for_status()
+        resp = await get_http_client("places").post(PLACES_TEXT_SEARCH_URL, headers=headers, json=body)
+        resp.raise_for_status()
 
         data = resp.json()
         places = data.get("places", [])
         if not places:
             logger.warning("Places API returned no results for query=%r", query)
+            if settings.CACHE_ENABLED:
+                await facility_store.put(name, address, None)
             return DisposalFacility(name=name, address=address)
 
         place = places[0]
@@ -72,6 +82,8 @@ async def enrich_facility(
             "Places API enriched %r → name=%r address=%r lat=%s lng=%s",
             name, enriched.name, enriched.address, enriched.latitude, enriched.longitude,
         )
+        if settings.CACHE_ENABLED:
+            await facility_store.put(name, address, enriched)
         return enriched
     except Exception as e:
         logger.warning("Places API lookup failed for %r (query=%r): %s", name, query, e, exc_info=True)
@@ -82,7 +94,13 @@ async def enrich_facilities(
     raw_facilities: List[dict],
     user_location: Optional[str] = None,
 ) -> List[DisposalFacility]:
-    """Enrich a list of raw facility dicts (name + address) concurrently."""
+    """
+    Enrich a list of raw facility dicts (name + address) concurrently.
+
+    Gemini sometimes lists one site twice under different names ("County Transfer
+    Station" / "Cobb County Solid Waste"); entries that resolve to the same
+    place_id are collapsed into the first one.
+    """
     tasks = [
         enrich_facility(
             name=f.get("name", "Unknown"),
@@ -91,4 +109,13 @@ async def enrich_facilities(
         )
         for f in raw_facilities
     ]
-    return list(await asyncio.gather(*tasks))
+    facilities: List[DisposalFacility] = []
+    seen_place_ids = set()
+    for facility in await asyncio.gather(*tasks):
+        if facility.place_id:
+            if facility.place_id in seen_place_ids:
+                logger.info("Dropping duplicate facility %r (place_id=%s)", facility.name, facility.place_id)
+                continue
+            seen_place_ids.add(facility.place_id)
+        facilities.append(facility)
+    return facilities
@@ -0,0 +1,124 @@
+"""
+Caching wrapper around the Tavily web search tool used by the disposal agent.
+
+The agent asks near-identical questions all day ("Marietta GA hazardous waste
+drop-off"), so queries are normalized and answered from a TieredCache (memory
+LRU + SQLite) while fresh. Identical queries that are already in flight share
+one Tavily call (SingleFlight). Every lookup is logged with its latency and source, and
+stats() reports hit ratio plus searches saved per day.
+"""
+import json
+import logging
+import time
+from collections import OrderedDict
+from datetime import date
+from typing import Any, Dict
+
+from langchain_core.tools import BaseTool, StructuredTool
+
+from app.core.config import settings
+from app.services.cache import SingleFlight, TieredCache, normalize_text
+
+logger = logging.getLogger(__name__)
+
+DAILY_HISTORY_DAYS = 7
+
+
+class CachedSearch:
+    """Serves a search tool's results from cache, coalescing identical in-flight queries."""
+
+    def __init__(self, tool: BaseTool, max_entries: int, ttl_seconds: float):
+        self.tool = tool
+        self.cache: TieredCache[Dict[str, Any]] = TieredCache(
+            name="web_search",
+            max_entries=max_entries,
+            ttl_seconds=ttl_seconds,
+            dumps=lambda result: result,
+            loads=lambda data: data,
+        )
+        self._flights: SingleFlight[Dict[str, Any]] = SingleFlight("web_search")
+        self.live_searches = 0
+        self.cache_hits = 0
+        self.errors = 0
+        self.live_latency_ms = 0.0
+        self.saved_per_day: "OrderedDict[str, int]" = OrderedDict()
+
+    @staticmethod
+    def cache_key(args: Dict[str, Any]) -> str:
+        options = {k: v for k, v in args.items() if k != "query" and v is not None}
+        return f"{normalize_text(args.get('query', ''))}|{json.dumps(options, sort_keys=True, default=str)}"
+
+    def _record_saved(self) -> None:
+        today = date.today().isoformat()
+        self.saved_per_day[today] = self.saved_per_day.get(today, 0) + 1
+        while len(self.saved_per_day) > DAILY_HISTORY_DAYS:
+            self.saved_per_day.popitem(last=False)
+
+    async def _fetch(self, key: str, args: Dict[str, Any]) -> Dict[str, Any]:
+        start = time.perf_counter()
+        try:
+            result = await self.tool.ainvoke(args)
+        except Exception:
+            self.errors += 1
+            raise
+        latency_ms = (time.perf_counter() - start) * 1000
+        self.live_searches += 1
+        self.live_latency_ms += latency_ms
+
+        # TavilySearch reports failures as {"error": ...} rather than raising — never cache those
+        if isinstance(result, dict) and "error" not in result:
+            if settings.CACHE_ENABLED:
+                await self.cache.aset(key, result)
+        else:
+            self.errors += 1
+        logger.info("Web search — source=live latency_ms=%.1f query=%r", latency_ms, args.get("query"))
+        return result
+
+    async def search(self, **args: Any) -> Dict[str, Any]:
+        start = time.perf_counter()
+        key = self.cache_key(args)
+
+        cached = await self.cache.aget(key) if settings.CACHE_ENABLED else None
+        if cached is not None:
+            self.cache_hits += 1
+            self._record_saved()
+            logger.info(
+                "Web search — source=cache latency_ms=%.1f query=%r",
+                (time.perf_counter() - start) * 1000, args.get("query"),
+            )
+            return cached
+
+        joined = self._flights.in_flight(key)
+        result = await self._flights.run(key, lambda: self._fetch(key, args))
+        if joined:
+            self._record_saved()
+            logger.info(
+                "Web search — source=coalesced latency_ms=%.1f query=%r",
+                (time.perf_counter() - start) * 1000, args.get("query"),
+            )
+        return result
+
+    def as_tool(self) -> StructuredTool:
+        """A drop-in replacement for the wrapped tool: same name, description and args schema."""
+        return StructuredTool.from_function(
+            coroutine=self.search,
+            name=self.tool.name,
+            description=self.tool.description,
+            args_schema=self.tool.args_schema,
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        coalesced = self._flights.coalesced
+        served = self.cache_hits + coalesced
+        lookups = served + self.live_searches
+        return {
+            "lookups": lookups,
+            "live_searches": self.live_searches,
+            "cache_hits": self.cache_hits,
+            "coalesced": coalesced,
+            "errors": self.errors,
+            "hit_ratio": round(served / lookups, 4) if lookups else 0.0,
+            "avg_live_latency_ms": round(self.live_latency_ms / self.live_searches, 1) if self.live_searches else 0.0,
+            "searches_saved_per_day": dict(self.saved_per_day),
+            "cache": self.cache.stats(),
+        }
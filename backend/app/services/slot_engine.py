@@ -0,0 +1,143 @@
+"""
+Deterministic drop-off slot suggestions from a user's busy intervals.
+
+1. Busy intervals (from FreeBusy, usually in UTC) are padded with a
+   30-minute buffer on both sides, sorted and merged in one sweep.
+2. For each of the next HORIZON_DAYS days, the facility-hours window in the
+   user's timezone minus the merged busy intervals gives the free windows;
+   candidates are taken on a 30-minute grid inside them, always in the
+   user's timezone whatever zone the busy intervals came in.
+3. Candidates are scored with the same rules the Gemini prompt used: weekday
+   mornings 9–12 first, then early afternoons 1–4, sooner days slightly ahead.
+   At most one slot per day, and at least one weekend slot when one is free.
+
+Runs in well under a millisecond for a week of events.
+"""
+import logging
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta, timezone, tzinfo
+from typing import Dict, Iterable, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+Interval = Tuple[datetime, datetime]
+
+BUFFER = timedelta(minutes=30)
+SLOT_LENGTH = timedelta(hours=1)
+GRID = timedelta(minutes=30)
+MIN_LEAD = timedelta(hours=1)
+HORIZON_DAYS = 7
+DAY_START_HOUR = 8
+DAY_END_HOUR = 18
+SUGGESTION_COUNT = 5
+
+
+@dataclass(frozen=True)
+class Slot:
+    start: datetime  # in the user's timezone
+    score: float
+    reason: str
+
+    @property
+    def is_weekend(self) -> bool:
+        return self.start.weekday() >= 5
+
+
+def merge_intervals(intervals: Iterable[Interval], buffer: timedelta = BUFFER) -> List[Interval]:
+    """Pad every interval by `buffer` on both sides, then merge overlaps in one sorted sweep."""
+    merged: List[Interval] = []
+    for start, end in sorted((s - buffer, e + buffer) for s, e in intervals):
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def free_windows(window: Interval, busy: List[Interval]) -> List[Interval]:
+    """Subtract sorted, merged `busy` intervals from `window`."""
+    start, end = window
+    free: List[Interval] = []
+    for busy_start, busy_end in busy:
+        if busy_end <= start:
+            continue
+        if busy_start >= end:
+            break
+        if busy_start > start:
+            free.append((start, busy_start))
+        start = max(start, busy_end)
+    if start < end:
+        free.append((start, end))
+    return free
+
+
+def _score(start: datetime, day_index: int) -> Tuple[float, str]:
+    hour = start.hour + start.minute / 60
+    weekend = start.weekday() >= 5
+    if weekend:
+        score, reason = (2.0, "Free weekend morning") if 9 <= hour < 12 else (1.5, "Free weekend slot")
+    elif 9 <= hour < 12:
+        score, reason = 3.0, "Free weekday morning"
+    elif 13 <= hour < 16:
+        score, reason = 2.5, "Free early afternoon"
+    else:
+        score, reason = 1.0, "Open, outside peak hours"
+    if start.minute == 0:
+        score += 0.1
+    return score - 0.05 * day_index, reason
+
+
+def _round_up(moment: datetime, step: timedelta) -> datetime:
+    """Round up to the next multiple of `step` past the hour (10:07 → 10:30 for a 30-minute grid)."""
+    hour = moment.replace(minute=0, second=0, microsecond=0)
+    steps = -((hour - moment) // step)
+    return hour + steps * step
+
+
+def candidate_slots(busy: List[Interval], now: datetime, tz: tzinfo) -> List[Slot]:
+    """Every free grid-aligned slot in the horizon, scored. `busy` must already be merged."""
+    local_now = now.astimezone(tz)
+    earliest = local_now + MIN_LEAD
+    horizon_end = local_now + timedelta(days=HORIZON_DAYS)  # events are only fetched this far ahead
+    slots: List[Slot] = []
+    for day_index in range(HORIZON_DAYS + 1):
+        day = local_now.date() + timedelta(days=day_index)
+        window_start = datetime.combine(day, time(DAY_START_HOUR), tzinfo=tz)
+        window_end = min(datetime.combine(day, time(DAY_END_HOUR), tzinfo=tz), horizon_end)
+        if window_end <= earliest:
+            continue
+        window_start = max(window_start, _round_up(earliest, GRID))
+        for free_start, free_end in free_windows((window_start, window_end), busy):
+            # A window that opens at the end of a busy interval carries that interval's
+            # zone (UTC from FreeBusy) — grid, score and display must use the user's
+            start = _round_up(free_start.astimezone(tz), GRID)
+            while start + SLOT_LENGTH <= free_end:
+                score, reason = _score(start, day_index)
+                slots.append(Slot(start=start, score=score, reason=reason))
+                start += GRID
+    return slots
+
+
+def pick_slots(candidates: List[Slot], count: int = SUGGESTION_COUNT) -> List[Slot]:
+    """Best slot per day, top `count` days, with at least one weekend slot if any is free. Ordered by time."""
+    best_per_day: Dict[date, Slot] = {}
+    for slot in candidates:
+        day = slot.start.date()
+        if day not in best_per_day or slot.score > best_per_day[day].score:
+            best_per_day[day] = slot
+    ranked = sorted(best_per_day.values(), key=lambda s: (-s.score, s.start))
+    chosen = ranked[:count]
+    if chosen and not any(s.is_weekend for s in chosen):
+        weekend = next((s for s in ranked[count:] if s.is_weekend), None)
+        if weekend is not None:
+            chosen[-1] = weekend
+    return sorted(chosen, key=lambda s: s.start)
+
+
+def suggest_slots(busy_intervals: Iterable[Interval], now: datetime, tz: tzinfo) -> List[Slot]:
+    """Busy intervals in, up to SUGGESTION_COUNT non-overlapping slots out (one per day, in time order)."""
+    busy = merge_intervals(busy_intervals)
+    if now.tzinfo is None:
+        now = now.replace(tzinfo=timezone.utc)
+    return pick_slots(candidate_slots(busy, now, tz))
@@ -0,0 +1,128 @@
+"""
+Tolerant parsing of Gemini's JSON answers straight into Pydantic models.
+
+Gemini is told to return a bare JSON array, but it sometimes wraps it in
+```json fences, prefixes a sentence of prose or appends a closing remark.
+extract_json() finds the JSON value in one left-to-right scan using the C
+decoder's raw_decode, so none of that needs stripping first.
+
+parse_model_list() validates the whole array through a cached TypeAdapter in
+one call. If that fails, elements are validated one by one: bad nested list
+entries (e.g. a facility without an address) and bad optional fields are
+dropped, and elements that still don't validate are skipped — one malformed
+item no longer fails the whole response.
+"""
+import json
+import logging
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Type, TypeVar
+
+from pydantic import BaseModel, TypeAdapter, ValidationError
+
+logger = logging.getLogger(__name__)
+
+M = TypeVar("M", bound=BaseModel)
+
+_decoder = json.JSONDecoder()
+
+# Process-wide counters, reported by /api/v1/metrics
+_stats = {"parsed": 0, "salvaged_elements": 0, "dropped_elements": 0, "failures": 0}
+
+
+def extract_json(text: str) -> Any:
+    """
+    Return the first JSON array or object in `text`, ignoring fences and surrounding prose.
+
+    Raises ValueError if the text contains no decodable JSON array/object.
+    """
+    pos = 0
+    while True:
+        starts = [i for i in (text.find("[", pos), text.find("{", pos)) if i != -1]
+        if not starts:
+            break
+        start = min(starts)
+        try:
+            value, _ = _decoder.raw_decode(text, start)
+            if isinstance(value, dict) or (isinstance(value, list) and all(isinstance(v, dict) for v in value)):
+                return value
+        except json.JSONDecodeError:
+            pass
+        pos = start + 1  # a bracket inside prose, e.g. "[note]" or "[1]" — keep scanning
+    _stats["failures"] += 1
+    logger.error("No JSON found in model response — raw_text=%r", text[:500])
+    raise ValueError("Model response did not contain JSON")
+
+
+@lru_cache(maxsize=None)
+def list_adapter(model: Type[M]) -> TypeAdapter:
+    return TypeAdapter(List[model])
+
+
+def _repair(element: Dict[str, Any], error: ValidationError, model: Type[BaseModel]) -> Optional[Dict[str, Any]]:
+    """Drop the parts of `element` that failed validation, if they can be dropped safely."""
+    repaired = dict(element)
+    bad_entries: Dict[str, set] = {}
+    for err in error.errors():
+        loc = err["loc"]
+        if not loc or not isinstance(loc[0], str):
+            return None
+        field = loc[0]
+        if len(loc) >= 2 and isinstance(loc[1], int) and isinstance(repaired.get(field), list):
+            bad_entries.setdefault(field, set()).add(loc[1])
+        elif field in model.model_fields and not model.model_fields[field].is_required():
+            repaired.pop(field, None)
+        else:
+            return None  # a required field is missing/invalid — nothing to salvage
+    for field, indexes in bad_entries.items():
+        repaired[field] = [v for i, v in enumerate(repaired[field]) if i not in indexes]
+    return repaired
+
+
+def _validate_each(data: List[Any], model: Type[M]) -> List[M]:
+    results: List[M] = []
+    for index, element in enumerate(data):
+        try:
+            results.append(model.model_validate(element))
+            continue
+        except ValidationError as e:
+            error = e
+        repaired = _repair(element, error, model) if isinstance(element, dict) else None
+        if repaired is not None:
+            try:
+                results.append(model.model_validate(repaired))
+                _stats["salvaged_elements"] += 1
+                logger.warning("Salvaged %s element %d by dropping invalid fields: %s", model.__name__, index, error)
+                continue
+            except ValidationError:
+                pass
+        _stats["dropped_elements"] += 1
+        logger.warning("Dropped invalid %s element %d: %s — raw=%r", model.__name__, index, error, element)
+    return results
+
+
+def parse_model_list(text: str, model: Type[M]) -> List[M]:
+    """
+    Extract the JSON array from a model response and validate it into `model` instances.
+
+    A single object is treated as a one-element array. Raises ValueError if no JSON
+    is found, or if there were elements but none of them could be salvaged.
+    """
+    data = extract_json(text)
+    if isinstance(data, dict):
+        # {"items": [...]} wrappers, or a lone object
+        lists = [v for v in data.values() if isinstance(v, list)]
+        data = lists[0] if len(data) == 1 and len(lists) == 1 else [data]
+    try:
+        items = list_adapter(model).validate_python(data)
+    except ValidationError:
+        items = _validate_each(data, model)
+        if data and not items:
+            _stats["failures"] += 1
+            raise ValueError(f"No valid {model.__name__} in model response")
+    _stats["parsed"] += 1
+    logger.debug("Parsed %d %s from model response", len(items), model.__name__)
+    return items
+
+
+def stats() -> Dict[str, int]:
+    return dict(_stats)
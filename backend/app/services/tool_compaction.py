@@ -0,0 +1,136 @@
+"""
+Compaction of web search results between disposal-loop iterations.
+
+Every disposal_agent call resends the whole message history, so raw Tavily
+results from earlier searches would be paid for again on each iteration.
+After each `tools` step:
+
+- results in the newest ToolMessages are reduced to title / url / snippet,
+  snippets cut to DISPOSAL_SNIPPET_CHARS, and URLs already returned by an
+  earlier search are dropped
+- ToolMessages from earlier iterations are collapsed to one line per result
+  (title, url and the start of the snippet) — the model has already read them
+
+Messages are replaced in place (same id and tool_call_id), so every tool call
+still has exactly one matching response. Sizes are estimated at ~4 characters
+per token; there is no tokenizer on this path.
+"""
+import json
+import logging
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from langchain_core.messages import AIMessage, BaseMessage, ToolMessage
+
+logger = logging.getLogger(__name__)
+
+CHARS_PER_TOKEN = 4
+TRIMMED = "trimmed"
+SUMMARY = "summary"
+
+
+def estimate_tokens(messages: List[BaseMessage]) -> int:
+    return sum(len(str(m.content)) for m in messages) // CHARS_PER_TOKEN
+
+
+def _clip(text: Optional[str], limit: int) -> str:
+    text = " ".join((text or "").split())
+    return text if len(text) <= limit else text[: max(0, limit - 1)].rstrip() + "…"
+
+
+def _parse(content: Any) -> Optional[Dict[str, Any]]:
+    if isinstance(content, dict):
+        return content
+    try:
+        parsed = json.loads(content)
+    except (TypeError, ValueError):
+        return None
+    return parsed if isinstance(parsed, dict) else None
+
+
+def _result_urls(content: Any) -> Set[str]:
+    parsed = _parse(content)
+    if parsed is None:
+        return set()
+    return {r["url"] for r in parsed.get("results") or [] if isinstance(r, dict) and r.get("url")}
+
+
+def _urls(message: ToolMessage) -> Set[str]:
+    if "urls" in message.response_metadata:
+        return set(message.response_metadata["urls"])
+    return _result_urls(message.content)
+
+
+def trim_result(content: Any, seen_urls: Set[str], snippet_chars: int) -> str:
+    """Newest search result: drop repeated URLs and everything but title / url / snippet."""
+    parsed = _parse(content)
+    if parsed is None:
+        return _clip(str(content), snippet_chars * 2)  # error text or an unexpected shape
+    results = []
+    for r in parsed.get("results") or []:
+        if not isinstance(r, dict) or not r.get("url") or r["url"] in seen_urls:
+            continue
+        seen_urls.add(r["url"])
+        results.append({"title": r.get("title", ""), "url": r["url"], "content": _clip(r.get("content"), snippet_chars)})
+    trimmed: Dict[str, Any] = {"query": parsed.get("query"), "results": results}
+    if parsed.get("answer"):
+        trimmed["answer"] = _clip(parsed["answer"], snippet_chars)
+    if parsed.get("error"):
+        trimmed["error"] = _clip(str(parsed["error"]), snippet_chars)
+    return json.dumps(trimmed, ensure_ascii=False)
+
+
+def summarize_result(content: Any, snippet_chars: int) -> str:
+    """Earlier search result: one line per result, kept only as a reminder of what was found."""
+    parsed = _parse(content)
+    if parsed is None:
+        return _clip(str(content), snippet_chars)
+    lines = [f"Earlier search: {parsed.get('query') or ''}".rstrip()]
+    if parsed.get("answer"):
+        lines.append(f"Answer: {_clip(parsed['answer'], snippet_chars)}")
+    for r in parsed.get("results") or []:
+        if isinstance(r, dict):
+            lines.append(f"- {r.get('title', '')} ({r.get('url', '')}): {_clip(r.get('content'), snippet_chars // 4)}")
+    return "\n".join(lines)
+
+
+def _replace(message: ToolMessage, content: str, stage: str, urls: Set[str]) -> ToolMessage:
+    # URLs are kept in metadata (never sent to the model) so summaries still take part in dedup
+    return message.model_copy(update={
+        "content": content,
+        "response_metadata": {**message.response_metadata, "compaction": stage, "urls": sorted(urls)},
+    })
+
+
+def compact_tool_messages(
+    messages: List[BaseMessage], snippet_chars: int,
+) -> Tuple[List[ToolMessage], int, int]:
+    """
+    Compacted replacements for the ToolMessages in `messages`, plus the estimated
+    token size of all ToolMessages before and after. Only changed messages are
+    returned; each keeps its id so add_messages swaps it in place.
+    """
+    last_call = max((i for i, m in enumerate(messages) if isinstance(m, AIMessage) and m.tool_calls), default=-1)
+    replacements: List[ToolMessage] = []
+    seen_urls: Set[str] = set()
+    before = after = 0
+
+    for i, message in enumerate(messages):
+        if not isinstance(message, ToolMessage):
+            continue
+        stage = message.response_metadata.get("compaction")
+        before += len(str(message.content))
+        new: Optional[ToolMessage] = None
+        if i < last_call:
+            urls = _urls(message)
+            seen_urls |= urls
+            if stage != SUMMARY:
+                new = _replace(message, summarize_result(message.content, snippet_chars), SUMMARY, urls)
+        elif stage is None:
+            trimmed = trim_result(message.content, seen_urls, snippet_chars)
+            new = _replace(message, trimmed, TRIMMED, _result_urls(trimmed))
+        if new is not None and len(str(new.content)) < len(str(message.content)):
+            replacements.append(new)
+            message = new
+        after += len(str(message.content))
+
+    return replacements, before // CHARS_PER_TOKEN, after // CHARS_PER_TOKEN
@@ -1,12 +1,17 @@
 import logging
+from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.core.config import settings
 from app.routes import user
 from app.routes.classification import router as classification_router
-from app.database import engine, Base
+from app.database import engine, Base, dispose_async_engine
+from app.core.jwks import jwks_cache
+from app.services.http_clients import http_clients
+from app.services.llm_clients import llm_clients
 from app.routes.calendar import router as calendar_router
+from app.routes.metrics import router as metrics_router
 
 # Configure logging for the entire backend
 logging.basicConfig(
@@ -25,8 +30,22 @@ logger = logging.getLogger(__name__)
 Base.metadata.create_all(bind=engine)
 logger.info("Database tables ensured")
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One pooled HTTP client per upstream for the life of the process
+    http_clients.open_all()
+    if settings.SUPABASE_URL and not settings.BYPASS_AUTH:
+        await jwks_cache.start()
+    if settings.LLM_WARMUP_ON_STARTUP and settings.GEMINI_API_KEY:
+        await llm_clients.warm_up()
+    yield
+    await jwks_cache.stop()
+    await http_clients.aclose()
+    await llm_clients.aclose()
+    await dispose_async_engine()
+
 # Create the FastAPI app
-app = FastAPI(title="Environmental Agent API", version="1.0.0")
+app = FastAPI(title="Environmental Agent API", version="1.0.0", lifespan=lifespan)
 
 # CORS — allows frontend to talk to backend (configure CORS_ORIGINS in .env to override)
 app.add_middleware(
@@ -41,6 +60,7 @@ app.add_middleware(
 app.include_router(user.router, prefix="/api/v1")
 app.include_router(classification_router)
 app.include_router(calendar_router)
+app.include_router(metrics_router)
 
 @app.get("/")
 def home():
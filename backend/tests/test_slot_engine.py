@@ -0,0 +1,79 @@
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+from app.services.slot_engine import (
+    SLOT_LENGTH,
+    Slot,
+    free_windows,
+    merge_intervals,
+    pick_slots,
+    suggest_slots,
+)
+
+UTC = timezone.utc
+NEW_YORK = ZoneInfo("America/New_York")
+
+
+def at(day: int, hour: int, minute: int = 0, tz=UTC) -> datetime:
+    return datetime(2026, 4, day, hour, minute, tzinfo=tz)
+
+
+def test_merge_intervals_pads_and_merges_overlaps():
+    busy = [(at(6, 10), at(6, 11)), (at(6, 9), at(6, 9, 30)), (at(6, 15), at(6, 16))]
+    merged = merge_intervals(busy, buffer=timedelta(minutes=30))
+    assert merged == [(at(6, 8, 30), at(6, 11, 30)), (at(6, 14, 30), at(6, 16, 30))]
+
+
+def test_merge_intervals_without_buffer_keeps_touching_intervals_merged():
+    merged = merge_intervals([(at(6, 10), at(6, 11)), (at(6, 11), at(6, 12))], buffer=timedelta(0))
+    assert merged == [(at(6, 10), at(6, 12))]
+
+
+def test_free_windows_subtracts_busy():
+    window = (at(6, 8), at(6, 18))
+    busy = [(at(6, 7), at(6, 9)), (at(6, 12), at(6, 13)), (at(6, 17), at(6, 19))]
+    assert free_windows(window, busy) == [(at(6, 9), at(6, 12)), (at(6, 13), at(6, 17))]
+
+
+def test_free_windows_fully_busy():
+    assert free_windows((at(6, 8), at(6, 18)), [(at(6, 7), at(6, 19))]) == []
+
+
+def test_pick_slots_one_per_day_in_time_order():
+    candidates = [
+        Slot(start=at(6, 9), score=3.0, reason="a"),
+        Slot(start=at(6, 14), score=2.5, reason="b"),
+        Slot(start=at(7, 9), score=2.9, reason="c"),
+    ]
+    assert pick_slots(candidates, count=5) == [candidates[0], candidates[2]]
+
+
+def test_pick_slots_swaps_in_a_weekend_slot():
+    # 2026-04-06 is a Monday; the 11th is a Saturday
+    weekdays = [Slot(start=at(day, 9), score=3.0, reason="weekday") for day in (6, 7, 8)]
+    weekend = Slot(start=at(11, 10), score=2.0, reason="weekend")
+    chosen = pick_slots(weekdays + [weekend], count=2)
+    assert weekend in chosen
+    assert len(chosen) == 2
+
+
+def test_suggest_slots_uses_user_timezone_for_utc_busy_intervals():
+    # FreeBusy answers in UTC: 12:00–15:00Z is 08:00–11:00 in New York (EDT),
+    # so with the 30-minute buffer the first free slot each day is 11:30 local
+    now = at(6, 0)  # Sunday 20:00 in New York
+    busy = [(at(day, 12), at(day, 15)) for day in range(6, 14)]
+    slots = suggest_slots(busy, now, NEW_YORK)
+    assert len(slots) == 5
+    for slot in slots:
+        assert slot.start.utcoffset() == timedelta(hours=-4)
+        assert slot.start.strftime("%H:%M") == "11:30"
+    assert slots[0].reason == "Free weekday morning"
+
+
+def test_suggest_slots_never_overlaps_buffered_busy_time():
+    now = at(6, 0)
+    busy = [(at(day, 13), at(day, 14)) for day in range(6, 14)]
+    padded = merge_intervals(busy)
+    for slot in suggest_slots(busy, now, NEW_YORK):
+        assert 8 <= slot.start.hour < 18
+        assert all(slot.start + SLOT_LENGTH <= start or slot.start >= end for start, end in padded)